@@ -1,24 +1,54 @@
-from flask import Flask, render_template, Response, jsonify, request, redirect, url_for, make_response
+from flask import Flask, render_template, Response, jsonify, request, redirect, url_for, make_response, send_file, abort
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-import cv2, mysql.connector, os, datetime, jwt
-from collections import OrderedDict
+import cv2, os, datetime, jwt
 import numpy as np
-from ultralytics import YOLO   # ✅ YOLOv8 for person detection
+from detectors import MODEL_SIZES
+from cadence import DetectionCadence
+from batch import TRACKERS, JobManager
+from engine import AnalyticsEngine, EngineRegistry, count_stream, mjpeg_stream
+from encoding import stream_profile
+from heatmap import DEFAULT_WINDOW, HEATMAP_WINDOWS, window_label
+from metrics import ACTIVE_TRACKS, REGISTRY, profiler
+from motion import MotionGate
+from occupancy import OccupancyStore
+from pipeline import EOF_POLICIES, HOLD
+from plugins import DETECTOR_PLUGINS, DetectorSet, make_tracker
+from roi import RegionCropper
+from zones import ZoneCache, zone_geometry, zone_points
+import db
 
 app = Flask(__name__)
+# batch.py's spawned pool workers re-import this file as __mp_main__ when it is run directly. They only
+# need its functions, so nothing below that starts a thread, opens a database or loads a model runs there.
+SERVING = __name__ != "__mp_main__"
 app.config["UPLOAD_FOLDER"] = "uploads"
+app.config["RESULTS_FOLDER"] = "results"   # offline job outputs
 app.config["ALLOWED_EXTENSIONS"] = {"mp4", "avi", "mov", "mkv"}
 app.config["SECRET_KEY"] = "your_secret_key"   # ✅ JWT Secret
-
-# ----------------- DATABASE CONNECTION -----------------
-def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="root",
-        database="zone_app_db"
-    )
+app.config["TRACKER"] = os.environ.get("TRACKER", "centroid")   # centroid, assignment, bytetrack or deepsort
+app.config["DETECTOR"] = os.environ.get("DETECTOR", "yolo")   # "yolo" or "hog"
+app.config["DETECTOR_DEVICE"] = os.environ.get("DETECTOR_DEVICE") or None   # e.g. "cpu" or "cuda:0"
+app.config["BOX_SHRINK"] = float(os.environ.get("BOX_SHRINK", "0"))   # fraction trimmed off tracked boxes
+app.config["DETECT_INTERVAL"] = int(os.environ.get("DETECT_INTERVAL", "1"))   # run YOLO every Nth frame
+app.config["ADAPTIVE_CADENCE"] = os.environ.get("ADAPTIVE_CADENCE") == "1"
+app.config["DETECT_ROI"] = os.environ.get("DETECT_ROI", "off")   # "off", "crop" to the zones, or "tile"
+app.config["ROI_TILE_SIZE"] = int(os.environ.get("ROI_TILE_SIZE", "1280"))
+app.config["MOTION_GATE"] = os.environ.get("MOTION_GATE") == "1"   # skip YOLO while the zones are still
+app.config["MOTION_THRESHOLD"] = float(os.environ.get("MOTION_THRESHOLD", "0.002"))   # changed-pixel fraction
+app.config["REID_REFRESH"] = int(os.environ.get("REID_REFRESH", "10"))   # frames before a track is re-embedded
+app.config["REID_IOU"] = float(os.environ.get("REID_IOU", "0.7"))   # box overlap that still reuses the embedding
+app.config["REID_BUDGET"] = int(os.environ.get("REID_BUDGET", "100"))   # stored embeddings per track
+
+# ----------------- ZONE CACHE -----------------
+zone_cache = ZoneCache(db.list_zones)
+
+# ----------------- OCCUPANCY HISTORY -----------------
+# Per-second/minute/hour rollups of every source's counts, written in batches by a background thread
+occupancy = None
+if SERVING:
+    occupancy = OccupancyStore()
+    occupancy.start()
 
 # ----------------- JWT HELPERS -----------------
 def generate_jwt(username):
@@ -49,9 +79,6 @@ def require_login(func):
     wrapper.__name__ = func.__name__
     return wrapper
 
-# ----------------- GLOBAL ZONE COUNTS -----------------
-zone_counts_global = {}
-
 # ----------------- AUTH -----------------
 @app.route("/")
 def home():
@@ -62,18 +89,14 @@ def signup():
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
+        email = request.form.get("email") or None
+        contact = request.form.get("contact") or None
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username=%s", (username,))
-        if cursor.fetchone():
-            conn.close()
-            return "User already exists!"
+        if db.find_user(username, email):
+            return "User or Email already exists!"
 
         hashed_pw = generate_password_hash(password)
-        cursor.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_pw))
-        conn.commit()
-        conn.close()
+        db.create_user(username, hashed_pw, email, contact)
         return redirect(url_for("login"))
     return render_template("signup.html")
 
@@ -83,11 +106,7 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE username=%s", (username,))
-        user = cursor.fetchone()
-        conn.close()
+        user = db.find_user(username)
 
         if user and check_password_hash(user["password"], password):
             token = generate_jwt(username)
@@ -117,11 +136,16 @@ def dashboard(user):
 @app.route("/dashboard3")
 @require_login
 def dashboard3(user):
-    return render_template("dashboard.html")
+    windows = [(window, window_label(window)) for window in HEATMAP_WINDOWS]
+    return render_template("dashboard.html", heatmap_windows=windows, heatmap_default=DEFAULT_WINDOW)
 
 # ----------------- VIDEO SOURCE -----------------
-camera = None
-yolo_model = YOLO("yolov8m.pt")   # ✅ Medium YOLOv8 for better detection
+# DETECTOR_BACKEND=torch|onnx|openvino, DETECTOR_INT8=1, MODEL_SIZE=n|s|m (default m)
+# Models load and warm up when the first source needs them. PRELOAD_MODEL=1 loads (and for torch,
+# fuses) the default model at import instead; see the README for what that shares across a fork.
+detectors = DetectorSet(app.config)
+if os.environ.get("PRELOAD_MODEL") == "1" and SERVING:
+    detectors.preload()
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in app.config["ALLOWED_EXTENSIONS"]
@@ -129,190 +153,220 @@ def allowed_file(filename):
 @app.route("/set_source", methods=["POST"])
 @require_login
 def set_source(user):
-    global camera
+    name = request.form.get("name") or "default"
     source_type = request.form.get("source")
+    model = request.form.get("model") or None   # per-source model size
+    if model and model not in MODEL_SIZES:
+        return jsonify({"error": f"Unknown model size {model}"}), 400
+    on_eof = request.form.get("on_eof") or "loop"   # what a video does at its end: loop, stop or next
+    if on_eof not in EOF_POLICIES:
+        return jsonify({"error": f"Unknown end-of-file policy {on_eof}"}), 400
+    detector = request.form.get("detector") or None   # per-source detector plugin
+    if detector and detector not in DETECTOR_PLUGINS:
+        return jsonify({"error": f"Unknown detector {detector}"}), 400
+    try:
+        if detector:
+            detectors.get(detector)
+        tracker = source_tracker(name, request.form.get("tracker") or None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ImportError as e:
+        return jsonify({"error": f"Plugin unavailable: {e}"}), 400
+    plugins = {"tracker": tracker, "detector": detector}
+    # The detector loads and warms up in the background while the capture connects
+    detectors.prepare(detector, model)
 
     if source_type == "webcam":
-        if camera: camera.release()
-        camera = cv2.VideoCapture(0)
+        engines.open(name, "webcam", model, **plugins)
         return jsonify({"status": "webcam selected"})
 
+    if source_type == "test":
+        engines.open(name, "test", model, **plugins)
+        return jsonify({"status": "test pattern selected"})
+
+    if source_type == "url" and request.form.get("url"):
+        engines.open(name, request.form["url"], model, **plugins)
+        return jsonify({"status": f"stream {request.form['url']} selected"})
+
     if "file" in request.files:
         file = request.files["file"]
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
             filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
             file.save(filepath)
-            if camera: camera.release()
-            camera = cv2.VideoCapture(filepath)
+            # "next" continues with the other uploaded videos, in name order after this one
+            playlist = [os.path.join(app.config["UPLOAD_FOLDER"], f)
+                        for f in sorted(os.listdir(app.config["UPLOAD_FOLDER"])) if allowed_file(f) and f > filename]
+            engines.open(name, filepath, model, on_eof, playlist, **plugins)
             return jsonify({"status": f"video {filename} selected"})
 
     return jsonify({"error": "Invalid source"}), 400
 
-# ----------------- TRACKER -----------------
-class CentroidTracker:
-    def __init__(self, maxDisappeared=40):
-        self.nextObjectID = 1
-        self.objects = OrderedDict()
-        self.disappeared = OrderedDict()
-        self.maxDisappeared = maxDisappeared
-
-    def register(self, centroid):
-        self.objects[self.nextObjectID] = centroid
-        self.disappeared[self.nextObjectID] = 0
-        self.nextObjectID += 1
-
-    def deregister(self, objectID):
-        del self.objects[objectID]
-        del self.disappeared[objectID]
-
-    def update(self, rects):
-        if len(rects) == 0:
-            for objectID in list(self.disappeared.keys()):
-                self.disappeared[objectID] += 1
-                if self.disappeared[objectID] > self.maxDisappeared:
-                    self.deregister(objectID)
-            return self.objects
-
-        inputCentroids = np.zeros((len(rects), 2), dtype="int")
-        for (i, (x, y, w, h)) in enumerate(rects):
-            cX = int(x + w / 2.0)
-            cY = int(y + h / 2.0)
-            inputCentroids[i] = (cX, cY)
-
-        if len(self.objects) == 0:
-            for i in range(0, len(inputCentroids)):
-                self.register(inputCentroids[i])
-        else:
-            objectIDs = list(self.objects.keys())
-            objectCentroids = list(self.objects.values())
-
-            D = np.linalg.norm(np.array(objectCentroids)[:, None] - inputCentroids, axis=2)
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
+@app.route("/sources")
+@require_login
+def list_sources(user):
+    return jsonify(engines.status())
 
-            usedRows, usedCols = set(), set()
-            for (row, col) in zip(rows, cols):
-                if row in usedRows or col in usedCols:
-                    continue
-                objectID = objectIDs[row]
-                self.objects[objectID] = inputCentroids[col]
-                self.disappeared[objectID] = 0
-                usedRows.add(row)
-                usedCols.add(col)
+@app.route("/remove_source", methods=["POST"])
+@require_login
+def remove_source(user):
+    if engines.remove(request.json.get('name')):
+        return jsonify({"status": "removed"})
+    return jsonify({"error": "Unknown source"}), 404
 
-            unusedRows = set(range(0, D.shape[0])).difference(usedRows)
-            unusedCols = set(range(0, D.shape[1])).difference(usedCols)
+# ----------------- VIDEO STREAM -----------------
+def detect_batch(frames, model=None, detector=None):
+    return detectors.detect(frames, model, detector)
+
+def shrink_boxes(boxes, factor):
+    pad = ((boxes[:, 2:] - boxes[:, :2]) * factor / 2).astype(np.int32)
+    return np.hstack([boxes[:, :2] + pad, boxes[:, 2:] - pad])
+
+def analyze_frame(engine, frame, result):
+    with engine.stage("track"):
+        if result is HOLD:
+            # Nothing moved in or near the zones since the last detection: keep every track where it is
+            tracks = engine.tracker.hold()
+        elif result is None:
+            # No detector pass scheduled for this frame: the tracker predicts positions
+            tracks = engine.tracker.predict()
+        else:
+            # Each tracker plugin applies its own confidence threshold to the detections
+            tracks = engine.tracker.update(result, frame)
+            engine.cadence.observe(tracks)
+
+    # BOX_SHRINK only trims what is drawn and the rectangle-zone overlap; foot points for polygons,
+    # tripwires and the heatmap always come from the full boxes
+    boxes = tracks["box"]
+    if app.config["BOX_SHRINK"]:
+        boxes = shrink_boxes(boxes, app.config["BOX_SHRINK"])
+
+    for track, (x1, y1, x2, y2) in zip(tracks, boxes.tolist()):
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, f"ID {track['id']}", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    # One vectorized tracks x zones overlap test instead of a per-pair Python loop
+    with engine.stage("zones"):
+        zone_index = zone_cache.index_for(engine.name)
+        counts, membership = zone_index.assign(boxes, frame.shape, foot_boxes=tracks["box"])
+        zone_counts = zone_index.counts(counts)
+        # Tripwire crossings and zone entries/exits from each track's previous state
+        engine.crossings.update(tracks["id"], tracks["box"], membership, zone_index)
+    ACTIVE_TRACKS.set(len(tracks), source=engine.name)
+    engine.heatmap.add(tracks["box"], frame.shape)
+
+    return frame, zone_counts
+
+def zone_region(name):
+    # Detect only inside the union of this source's zones, tiled when it is still very large
+    if app.config["DETECT_ROI"] == "off":
+        return None
+    tile_size = app.config["ROI_TILE_SIZE"] if app.config["DETECT_ROI"] == "tile" else 0
+    return RegionCropper(lambda: zone_cache.for_source(name), tile_size=tile_size)
 
-            for row in unusedRows:
-                objectID = objectIDs[row]
-                self.disappeared[objectID] += 1
-                if self.disappeared[objectID] > self.maxDisappeared:
-                    self.deregister(objectID)
+def motion_gate(name):
+    if not app.config["MOTION_GATE"]:
+        return None
+    return MotionGate(lambda: zone_cache.for_source(name), min_energy=app.config["MOTION_THRESHOLD"])
 
-            for col in unusedCols:
-                self.register(inputCentroids[col])
+def source_tracker(name, tracker):
+    # A new tracker plugin when the source asks for one it is not already running
+    engine = engines.get(name)
+    if tracker is None or (engine is not None and engine.tracker.name == tracker):
+        return None
+    return make_tracker(tracker, app.config)
 
-        return self.objects
+def create_engine(name):
+    zone_cache.ensure_loaded()
+    tracker = make_tracker(app.config["TRACKER"], app.config)
+    cadence = DetectionCadence(app.config["DETECT_INTERVAL"], adaptive=app.config["ADAPTIVE_CADENCE"])
+    return AnalyticsEngine(name, analyze_frame, tracker=tracker, cadence=cadence, region=zone_region(name),
+                           motion=motion_gate(name), recorder=occupancy.record)
 
-tracker = CentroidTracker()
+# One engine per named source; a single inference thread batches frames from all of them
+engines = EngineRegistry(detect_batch, create_engine, ready=detectors.is_ready) if SERVING else None
 
-# ----------------- VIDEO STREAM -----------------
 @app.route("/video_feed")
 @require_login
 def video_feed(user):
-    def generate():
-        global camera, zone_counts_global
-        while True:
-            if camera is None:
-                continue
-            success, frame = camera.read()
-            if not success:
-                camera.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                continue
-
-            results = yolo_model(frame, classes=[0], conf=0.3)
-
-            boxes = []
-            for r in results[0].boxes:
-                x1, y1, x2, y2 = map(int, r.xyxy[0])
-                w, h = x2 - x1, y2 - y1
-                boxes.append((x1, y1, w, h))
-
-            objects = tracker.update(boxes)
-
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM zones_data")
-            zones = cursor.fetchall()
-            conn.close()
-            zone_counts_global = {z['zone_name']: 0 for z in zones}
-
-            for (objectID, centroid) in objects.items():
-                cX, cY = centroid
-                matched_box = None
-                for (x, y, w, h) in boxes:
-                    if x <= cX <= x + w and y <= cY <= y + h:
-                        matched_box = (x, y, w, h)
-                        break
-                if matched_box:
-                    (x, y, w, h) = matched_box
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    cv2.putText(frame, f"ID {objectID}", (x, y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-                    for z in zones:
-                        zx1, zy1 = z['top_left_x'], z['top_left_y']
-                        zx2, zy2 = z['bottom_right_x'], z['bottom_right_y']
-                        px1, py1, px2, py2 = x, y, x + w, y + h
-
-                        overlap_x1 = max(zx1, px1)
-                        overlap_y1 = max(zy1, py1)
-                        overlap_x2 = min(zx2, px2)
-                        overlap_y2 = min(zy2, py2)
-
-                        if overlap_x1 < overlap_x2 and overlap_y1 < overlap_y2:
-                            zone_counts_global[z['zone_name']] += 1
-
-            ret, buffer = cv2.imencode(".jpg", frame)
-            if not ret:
-                continue
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n\r\n" + buffer.tobytes() + b"\r\n")
-
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    # ?profile=full|high|medium|low|thumb with optional width=, quality= and fps= overrides
+    try:
+        profile = stream_profile(request.args.get("profile"), request.args.get("width", type=int),
+                                 request.args.get("quality", type=int), request.args.get("fps", type=float))
+    except KeyError:
+        abort(400)
+    engine = engines.get_or_create(request.args.get("source", "default"))
+    return Response(mjpeg_stream(engine, profile), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+# ----------------- OFFLINE JOBS -----------------
+# Uploaded videos processed start to finish on a process pool; results are kept as CSV + JSON
+jobs = None
+if SERVING:
+    jobs = JobManager(app.config["RESULTS_FOLDER"], workers=int(os.environ.get("BATCH_WORKERS", "0")) or None)
+
+@app.route("/jobs", methods=["POST"])
+@require_login
+def submit_job(user):
+    file = request.files.get("file")
+    if not file or not allowed_file(file.filename):
+        return jsonify({"error": "Invalid video"}), 400
+    tracker = request.form.get("tracker", "assignment")
+    model = request.form.get("model") or None
+    if tracker not in TRACKERS or (model and model not in MODEL_SIZES):
+        return jsonify({"error": "Invalid tracker or model"}), 400
+    filename = secure_filename(file.filename)
+    filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+    file.save(filepath)
+    zone_cache.ensure_loaded()
+    zones = zone_cache.for_source(request.form.get("source") or None)
+    job_id = jobs.submit(filepath, zones, tracker=tracker, detector_options=(model, 0.3))
+    return jsonify({"job": job_id}), 202
+
+@app.route("/jobs")
+@require_login
+def list_jobs(user):
+    return jsonify(jobs.status())
+
+@app.route("/jobs/<job_id>")
+@require_login
+def job_status(user, job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/counts")
+@require_login
+def job_counts(user, job_id):
+    job = jobs.status(job_id)
+    if job is None or job["state"] != "done":
+        return jsonify({"error": "No result for this job"}), 404
+    return send_file(os.path.abspath(job["result"]["counts_file"]), mimetype="text/csv", as_attachment=True)
 
 # ----------------- ZONES CRUD -----------------
 @app.route("/save_zone", methods=["POST"])
 @require_login
 def save_zone(user):
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO zones_data (zone_name, top_left_x, top_left_y, bottom_right_x, bottom_right_y) "
-        "VALUES (%s, %s, %s, %s, %s)",
-        (data['label'], data['topleft']['x'], data['topleft']['y'],
-         data['bottomright']['x'], data['bottomright']['y'])
-    )
-    conn.commit()
-    conn.close()
+    (x1, y1, x2, y2), polygon = zone_geometry(data)
+    db.insert_zone(data['label'], x1, y1, x2, y2, data.get('source'), polygon)
+    zone_cache.reload()
     return jsonify({"status": "success"})
 
 @app.route("/get_zones")
 @require_login
 def get_zones(user):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM zones_data")
-    rows = cursor.fetchall()
-    conn.close()
+    zone_cache.ensure_loaded()
+    _, rows = zone_cache.snapshot()
     zones = []
     for r in rows:
         zones.append({
             "label": r['zone_name'],
             "topleft": {"x": r['top_left_x'], "y": r['top_left_y']},
-            "bottomright": {"x": r['bottom_right_x'], "y": r['bottom_right_y']}
+            "bottomright": {"x": r['bottom_right_x'], "y": r['bottom_right_y']},
+            "source": r.get('source_name'),
+            "points": zone_points(r)
         })
     return jsonify(zones)
 
@@ -320,44 +374,122 @@ def get_zones(user):
 @require_login
 def delete_zone(user):
     label = request.json.get('label')
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM zones_data WHERE zone_name=%s", (label,))
-    conn.commit()
-    conn.close()
+    db.delete_zone(label)
+    zone_cache.reload()
     return jsonify({"status": "deleted"})
 
 @app.route("/update_zone", methods=["POST"])
 @require_login
 def update_zone(user):
     data = request.json
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE zones_data SET top_left_x=%s, top_left_y=%s, bottom_right_x=%s, bottom_right_y=%s WHERE zone_name=%s",
-        (data['topleft']['x'], data['topleft']['y'],
-         data['bottomright']['x'], data['bottomright']['y'],
-         data['label'])
-    )
-    conn.commit()
-    conn.close()
+    (x1, y1, x2, y2), polygon = zone_geometry(data)
+    # A rectangle edit of a polygon or tripwire zone replaces its shape; schemas without the polygon
+    # column never have one to clear
+    zone_cache.ensure_loaded()
+    _, rows = zone_cache.snapshot()
+    had_polygon = any(r['zone_name'] == data['label'] and r.get('polygon') for r in rows)
+    db.update_zone(data['label'], x1, y1, x2, y2, polygon, clear_polygon=had_polygon)
+    zone_cache.reload()
     return jsonify({"status": "updated"})
 
 # ----------------- LIVE COUNTS ENDPOINT -----------------
+def occupancy_alert(zone_counts):
+    for zone, count in zone_counts.items():
+        if count > 10:
+            return f"⚠️ High occupancy in {zone}! ({count} people)"
+    return None
+
 @app.route("/get_counts")
 @require_login
 def get_counts(user):
-    global zone_counts_global
-    if not zone_counts_global:
-        zone_counts_global = {}
-
-    alert_message = None
-    for zone, count in zone_counts_global.items():
-        if count > 10:
-            alert_message = f"⚠️ High occupancy in {zone}! ({count} people)"
-            break
+    engine = engines.get(request.args.get("source", "default"))
+    zone_counts = engine.counts if engine else {}
+    flow = engine.crossings.totals() if engine else {"zones": {}, "lines": {}}
+    return jsonify({"counts": zone_counts, "alert": occupancy_alert(zone_counts), "flow": flow})
 
-    return jsonify({"counts": zone_counts_global, "alert": alert_message})
+@app.route("/crossing_events")
+@require_login
+def crossing_events(user):
+    # ?source=&since=<unix seconds>: recent tripwire in/out and zone enter/exit events, oldest first
+    engine = engines.get(request.args.get("source", "default"))
+    if engine is None:
+        abort(404)
+    return jsonify(engine.crossings.recent(request.args.get("since", 0.0, type=float)))
+
+@app.route("/counts_stream")
+@require_login
+def counts_stream(user):
+    # Server-sent events with count deltas and alerts as soon as the engine produces them;
+    # the login is checked once here and again on every keep-alive
+    engine = engines.get_or_create(request.args.get("source", "default"))
+    token = request.cookies.get("token")
+    stream = count_stream(engine, occupancy_alert, lambda: verify_jwt(token) is not None)
+    return Response(stream, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ----------------- SPATIAL HEATMAP -----------------
+@app.route("/heatmap")
+@require_login
+def heatmap(user):
+    # ?source=&window=<one of HEATMAP_WINDOWS, seconds>&format=png (one pixel per grid cell)
+    # or json (quantized uint8, base64)
+    engine = engines.get(request.args.get("source", "default"))
+    window = request.args.get("window", DEFAULT_WINDOW, type=int)
+    if engine is None or window not in engine.heatmap.windows:
+        abort(404)
+    if request.args.get("format") == "json":
+        grid = engine.heatmap.quantized(window)
+        return jsonify(grid) if grid else abort(404)
+    png = engine.heatmap.png(window)
+    if png is None:
+        abort(404)
+    return Response(png, mimetype="image/png", headers={"Cache-Control": "no-store"})
+
+# ----------------- OCCUPANCY HISTORY ENDPOINT -----------------
+@app.route("/occupancy")
+@require_login
+def occupancy_history(user):
+    # ?source=&zone=&start=&end= (unix seconds, default the last hour)&resolution=1|60|3600 (default: auto)
+    end = float(request.args.get("end") or datetime.datetime.now().timestamp())
+    start = float(request.args.get("start") or end - 3600)
+    resolution = request.args.get("resolution", type=int)
+    return jsonify(occupancy.query(request.args.get("source", "default"), start, end,
+                                   request.args.get("zone"), resolution))
+
+# ----------------- READINESS -----------------
+@app.route("/ready")
+def ready():
+    # For load balancers and orchestrators: 503 while a detector some source needs is still loading
+    # or warming up, or failed to load
+    is_ready, states = detectors.readiness()
+    return jsonify({"ready": is_ready, "detectors": states}), 200 if is_ready else 503
+
+# ----------------- METRICS -----------------
+# Prometheus scrape target; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+if os.environ.get("PROFILER") == "1" and SERVING:
+    profiler.start()
+
+@app.route("/metrics")
+def metrics():
+    token = os.environ.get("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        abort(401)
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/profiler", methods=["GET", "POST"])
+@require_login
+def sampling_profiler(user):
+    # POST {"enabled": true, "interval": 0.01} toggles sampling; GET returns collapsed stacks for flame graphs
+    if request.method == "POST":
+        data = request.json or {}
+        if data.get("enabled"):
+            profiler.start(data.get("interval"))
+        else:
+            profiler.stop()
+        return jsonify(profiler.status())
+    if request.args.get("format") == "json":
+        return jsonify(profiler.status())
+    return Response(profiler.collapsed(request.args.get("limit", 200, type=int)), mimetype="text/plain")
 
 # ----------------- MAIN -----------------
 if __name__ == "__main__":
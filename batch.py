@@ -0,0 +1,253 @@
+import argparse, csv, json, multiprocessing, os, queue, threading, time, uuid
+import cv2
+import numpy as np
+from tracking import AssignmentTracker, CentroidTracker, box_iou, solve_assignment
+from zones import ZoneIndex, is_line
+
+# ----------------- DETECTION -----------------
+def yolo_detector(model=None, conf=0.3):
+    # Default detector factory; runs inside each pool process, so every process loads its own model
+    from detectors import DetectorRegistry
+    detectors = DetectorRegistry()
+    return lambda frames: detectors.detect(frames, model, classes=[0], conf=conf, verbose=False)
+
+TRACKERS = {"centroid": CentroidTracker, "assignment": AssignmentTracker}
+
+worker_detect = None
+worker_progress = None
+
+def init_worker(detector_factory, options, progress):
+    global worker_detect, worker_progress
+    worker_detect = detector_factory(*options)
+    worker_progress = progress
+
+# ----------------- SEGMENTS -----------------
+def plan_segments(total, workers, overlap, min_length=300):
+    # Contiguous frame ranges; each one after the first starts `overlap` frames early to warm its
+    # tracker up on frames the previous segment also tracked, which is where IDs get stitched
+    count = max(1, min(workers * 2, total // max(min_length, 2 * overlap)))
+    bounds = np.linspace(0, total, count + 1).astype(int)
+    return [(int(start), int(stop), int(max(0, start - overlap))) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def process_segment(task):
+    path, zones, tracker_name, (start, stop, warmup), overlap, batch_size = task
+    index = ZoneIndex(zones)
+    tracker = TRACKERS[tracker_name]()
+    capture = cv2.VideoCapture(path)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, warmup)
+    counts, people, head, tail, spans = [], [], [], [], {}
+    position = warmup
+    while position < stop:
+        frames = []
+        while len(frames) < batch_size and position + len(frames) < stop:
+            success, frame = capture.read()
+            if not success:
+                break
+            frames.append(frame)
+        if not frames:
+            break
+        for frame, detections in zip(frames, worker_detect(frames)):
+            xyxy = detections[:, :4].astype(int)
+            tracks = tracker.update([(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in xyxy.tolist()])
+            record = (tracks["id"].copy(), tracks["box"].copy())
+            if position < start:
+                head.append(record)
+            else:
+                counts.append(index.assign(tracks["box"], frame.shape)[0])
+                people.append(len(tracks))
+                if position >= stop - overlap:
+                    tail.append(record)
+                for track_id in tracks["id"].tolist():
+                    first, _ = spans.get(track_id, (position, position))
+                    spans[track_id] = (first, position)
+            position += 1
+        with worker_progress.get_lock():
+            worker_progress.value += len(frames)
+    capture.release()
+    counts = np.array(counts, dtype=np.int32).reshape(len(counts), len(zones))
+    return {"start": start, "counts": counts, "people": people, "head": head, "tail": tail, "spans": spans}
+
+# ----------------- STITCHING -----------------
+def match_ids(previous_tail, current_head, min_iou=0.5):
+    # Votes over the shared frames: how often a previous-segment track and a current-segment track
+    # cover the same person; the best one-to-one assignment of votes links the two ID sets
+    frames = min(len(previous_tail), len(current_head))
+    if frames == 0:
+        return {}
+    votes = {}
+    for (prev_ids, prev_boxes), (cur_ids, cur_boxes) in zip(previous_tail[-frames:], current_head[-frames:]):
+        if len(prev_ids) == 0 or len(cur_ids) == 0:
+            continue
+        rows, cols = np.nonzero(box_iou(cur_boxes, prev_boxes) >= min_iou)
+        for cur, prev in zip(cur_ids[rows].tolist(), prev_ids[cols].tolist()):
+            votes[cur, prev] = votes.get((cur, prev), 0) + 1
+    if not votes:
+        return {}
+    cur_list = sorted({c for c, _ in votes})
+    prev_list = sorted({p for _, p in votes})
+    cost = np.zeros((len(cur_list), len(prev_list)))
+    for (cur, prev), n in votes.items():
+        cost[cur_list.index(cur), prev_list.index(prev)] = -n
+    rows, cols = solve_assignment(cost)
+    # A link needs the pair to agree on at least half of the shared frames
+    return {cur_list[r]: prev_list[c] for r, c in zip(rows, cols) if -cost[r, c] * 2 >= frames}
+
+def stitch(segments):
+    # Local per-segment track IDs -> global IDs, plus each global track's first and last frame
+    next_id, tracks, previous, previous_mapping = 0, {}, None, {}
+    for segment in segments:
+        links = match_ids(previous["tail"], segment["head"]) if previous else {}
+        mapping = {}
+        for local_id, (first, last) in sorted(segment["spans"].items()):
+            linked = links.get(local_id)
+            if linked in previous_mapping:
+                global_id = previous_mapping[linked]
+            else:
+                global_id, next_id = next_id, next_id + 1
+            mapping[local_id] = global_id
+            start, _ = tracks.get(global_id, (first, last))
+            tracks[global_id] = (start, last)
+        previous, previous_mapping = segment, mapping
+    return tracks
+
+# ----------------- JOBS -----------------
+def process_video(path, zones, out_dir, workers=None, tracker="assignment", overlap=30, batch_size=8,
+                  detector_factory=yolo_detector, detector_options=(), on_progress=None, job_id=None):
+    job_id = job_id or uuid.uuid4().hex[:12]
+    workers = workers or os.cpu_count() or 1
+    capture = cv2.VideoCapture(path)
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    capture.release()
+    if total <= 0:
+        raise ValueError(f"cannot read frames from {path}")
+    zones = tuple(z for z in zones if not is_line(z))   # tripwires only count on live sources
+    segments = plan_segments(total, workers, overlap)
+    tasks = [(path, zones, tracker, segment, overlap, batch_size) for segment in segments]
+
+    # Spawned, not forked: the app that submits jobs runs capture, inference and writer threads whose
+    # locks and torch/OpenMP state a forked child would inherit mid-use
+    context = multiprocessing.get_context("spawn")
+    progress = context.Value("q", 0)
+    started = time.monotonic()
+    with context.Pool(min(workers, len(tasks)), init_worker,
+                      (detector_factory, detector_options, progress)) as pool:
+        pending = pool.map_async(process_segment, tasks)
+        while not pending.ready():
+            pending.wait(0.5)
+            if on_progress:
+                # Warm-up frames are decoded twice, so progress can pass the frame count slightly
+                elapsed = time.monotonic() - started
+                on_progress(min(progress.value, total), total, progress.value / max(elapsed, 1e-6))
+        results = sorted(pending.get(), key=lambda r: r["start"])
+    elapsed = time.monotonic() - started
+
+    names = [z['zone_name'] for z in zones]
+    counts = np.vstack([r["counts"] for r in results]) if zones else np.zeros((0, 0), np.int32)
+    people = [n for r in results for n in r["people"]]
+    tracks = stitch(results)
+
+    os.makedirs(out_dir, exist_ok=True)
+    counts_path = os.path.join(out_dir, f"{job_id}.csv")
+    with open(counts_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "time"] + names + ["people"])
+        for frame, total_people in enumerate(people):
+            row = counts[frame].tolist() if len(names) else []
+            writer.writerow([frame, round(frame / fps, 3) if fps else ""] + row + [total_people])
+    summary = {
+        "job": job_id,
+        "video": path,
+        "frames": len(people),
+        "fps": fps,
+        "segments": len(segments),
+        "workers": min(workers, len(tasks)),
+        "seconds": round(elapsed, 2),
+        "throughput_fps": round(len(people) / max(elapsed, 1e-6), 2),
+        "unique_tracks": len(tracks),
+        "zones": {name: {"max": int(counts[:, i].max()) if len(counts) else 0,
+                         "mean": round(float(counts[:, i].mean()), 3) if len(counts) else 0.0}
+                  for i, name in enumerate(names)},
+        "counts_file": counts_path,
+    }
+    with open(os.path.join(out_dir, f"{job_id}.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+class JobManager:
+    # Queues offline jobs and runs them one at a time in a background thread; each job uses a process pool
+    def __init__(self, out_dir="results", workers=None, detector_factory=yolo_detector):
+        self.out_dir = out_dir
+        self.workers = workers
+        self.detector_factory = detector_factory
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.pending = queue.Queue()
+        self.thread = None
+
+    def submit(self, path, zones, **options):
+        job_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.jobs[job_id] = {"job": job_id, "video": path, "state": "queued", "frames_done": 0,
+                                 "frames_total": None, "throughput_fps": 0.0, "result": None, "error": None}
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="batch-jobs", daemon=True)
+                self.thread.start()
+        self.pending.put((job_id, path, tuple(zones), options))
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def _run(self):
+        while True:
+            job_id, path, zones, options = self.pending.get()
+            self._update(job_id, state="running", started=time.time())
+
+            def on_progress(done, total, fps, job_id=job_id):
+                self._update(job_id, frames_done=done, frames_total=total, throughput_fps=round(fps, 2))
+            try:
+                summary = process_video(path, zones, self.out_dir, self.workers, job_id=job_id,
+                                        detector_factory=self.detector_factory, on_progress=on_progress,
+                                        **options)
+            except Exception as e:
+                self._update(job_id, state="failed", error=str(e), finished=time.time())
+            else:
+                self._update(job_id, state="done", result=summary, frames_done=summary["frames"],
+                             frames_total=summary["frames"], throughput_fps=summary["throughput_fps"],
+                             finished=time.time())
+
+    def status(self, job_id=None):
+        with self.lock:
+            if job_id is not None:
+                job = self.jobs.get(job_id)
+                return dict(job) if job else None
+            return [dict(job) for job in self.jobs.values()]
+
+# ----------------- CLI -----------------
+def print_progress(done, total, fps):
+    print(f"\r{done}/{total} frames  {100 * done / total:5.1f}%  {fps:7.1f} FPS", end="", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count people in zones across a whole video, as fast as possible")
+    parser.add_argument("video")
+    parser.add_argument("--zones", help="JSON file with zone rows; defaults to the zones in the database")
+    parser.add_argument("--source", help="only use database zones for this source name")
+    parser.add_argument("--out", default="results")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tracker", choices=sorted(TRACKERS), default="assignment")
+    parser.add_argument("--model", choices=["n", "s", "m"], default=None, help="YOLOv8 size, default MODEL_SIZE")
+    parser.add_argument("--overlap", type=int, default=30, help="frames shared by neighbouring segments")
+    args = parser.parse_args()
+
+    if args.zones:
+        with open(args.zones) as f:
+            zone_rows = json.load(f)
+    else:
+        import db
+        zone_rows = [z for z in db.list_zones() if z.get('source_name') in (None, args.source)]
+    result = process_video(args.video, zone_rows, args.out, args.workers, args.tracker, args.overlap,
+                           detector_options=(args.model,), on_progress=print_progress)
+    print()
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,95 @@
+import argparse, json, time
+import numpy as np
+from benchmarks.bench_tracker import synthetic_crowd
+from cadence import DetectionCadence
+from tracking import AssignmentTracker, CentroidTracker, xywh_to_xyxy
+from zones import ZoneIndex
+
+# ----------------- INPUTS -----------------
+def synthetic_clip(count, frames, width=1920, height=1080):
+    return [rects for rects, _ in synthetic_crowd(count, frames, width, height)], (height, width, 3)
+
+def recorded_clip(path, model_name, max_frames):
+    # Runs YOLO once on every frame and returns the detections plus the measured cost per call
+    import cv2
+    from ultralytics import YOLO
+    model = YOLO(model_name)
+    capture = cv2.VideoCapture(path)
+    detections, costs, shape = [], [], None
+    while len(detections) < max_frames:
+        success, frame = capture.read()
+        if not success:
+            break
+        shape = frame.shape
+        start = time.perf_counter()
+        result = model(frame, classes=[0], conf=0.3, verbose=False)[0]
+        costs.append(time.perf_counter() - start)
+        xyxy = result.boxes.xyxy.cpu().numpy().astype(int).reshape(-1, 4)
+        detections.append(np.hstack([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]]))
+    capture.release()
+    return detections, shape, float(np.median(costs[1:] or costs)) * 1e3
+
+# ----------------- REPLAY -----------------
+def replay(detections, shape, zone_index, cadence, tracker, detect_ms):
+    # Counts per frame when the detector only runs on the frames the cadence picks
+    counts, detect_calls, track_time = [], 0, 0.0
+    for rects in detections:
+        start = time.perf_counter()
+        if cadence.should_detect():
+            detect_calls += 1
+            tracks = tracker.update([tuple(r) for r in rects])
+            cadence.observe(tracks)
+        else:
+            tracks = tracker.predict()
+        counts.append(zone_index.assign(tracks["box"], shape)[0])
+        track_time += time.perf_counter() - start
+    seconds = track_time + detect_calls * detect_ms / 1e3
+    return np.array(counts), len(detections) / seconds, detect_calls
+
+def reference_counts(detections, shape, zone_index):
+    # Ground truth: every detection counted directly, no tracker in between
+    return np.array([zone_index.assign(xywh_to_xyxy(rects), shape)[0] for rects in detections])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count accuracy vs FPS for detection intervals")
+    parser.add_argument("--clip", help="recorded video; runs YOLO on every frame as the reference")
+    parser.add_argument("--model", default="yolov8m.pt")
+    parser.add_argument("--people", type=int, default=60, help="synthetic crowd size when no clip is given")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--detect-ms", type=float, default=150.0, help="simulated detector cost per frame")
+    parser.add_argument("--tracker", choices=["centroid", "assignment"], default="assignment")
+    parser.add_argument("--intervals", default="1,2,3,5,8")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.clip:
+        detections, shape, detect_ms = recorded_clip(args.clip, args.model, args.frames)
+    else:
+        (detections, shape), detect_ms = synthetic_clip(args.people, args.frames), args.detect_ms
+
+    # Default zone: left half of the frame
+    zone_index = ZoneIndex(({"zone_name": "left", "top_left_x": 0, "top_left_y": 0,
+                             "bottom_right_x": shape[1] // 2, "bottom_right_y": shape[0]},))
+    truth = reference_counts(detections, shape, zone_index)
+    tracker_class = AssignmentTracker if args.tracker == "assignment" else CentroidTracker
+
+    modes = [(f"every {n}", DetectionCadence(n)) for n in map(int, args.intervals.split(","))]
+    modes.append(("adaptive", DetectionCadence(1, adaptive=True)))
+    for label, cadence in modes:
+        counts, fps, calls = replay(detections, shape, zone_index, cadence, tracker_class(), detect_ms)
+        error = np.abs(counts - truth)
+        result = {
+            "mode": label,
+            "frames": len(detections),
+            "detector_calls": calls,
+            "fps": round(fps, 2),
+            "count_mae": round(float(error.mean()), 3),
+            "count_max_error": int(error.max()),
+            "mean_count": round(float(truth.mean()), 2),
+        }
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{label:<10} detector calls {calls:>4}  {fps:>7.2f} FPS  "
+                  f"count MAE {result['count_mae']:>6.3f}  max error {result['count_max_error']:>3}  "
+                  f"(mean count {result['mean_count']})")
@@ -0,0 +1,221 @@
+import argparse, json, os, platform, resource, sys, time
+import cv2
+import numpy as np
+
+# The app is imported for its real per-frame path; keep its occupancy history out of the working directory
+os.environ.setdefault("OCCUPANCY_DB", ":memory:")
+import app as zone_app
+from encoding import StreamProfile
+from engine import AnalyticsEngine
+from metrics import ACTIVE_TRACKS, STAGE_SECONDS
+from plugins import make_tracker
+from sources import TestPatternCapture
+
+STAGES = ("capture", "detect", "analyze", "publish")
+ANALYZE_STEPS = ("track", "zones")   # timed inside analyze_frame by the app itself
+
+# ----------------- INPUTS -----------------
+def load_frames(clip, frames, width, height, people):
+    # Frames are decoded up front and replayed from memory; the capture stage times that replay
+    capture = cv2.VideoCapture(clip) if clip else TestPatternCapture(width, height, people=people)
+    loaded = []
+    while len(loaded) < frames:
+        success, frame = capture.read()
+        if not success:
+            break
+        loaded.append(frame)
+    capture.release()
+    if not loaded:
+        raise SystemExit(f"no frames read from {clip or 'test pattern'}")
+    return loaded
+
+# ----------------- DETECTORS -----------------
+class StubDetector:
+    # Finds the test pattern's figures by their body colour; a fixed extra delay stands in for model cost.
+    # Deterministic and CPU-only, so runs are comparable across machines without a GPU or weights.
+    def __init__(self, delay_ms=0.0):
+        self.delay = delay_ms / 1e3
+
+    def __call__(self, frame):
+        mask = cv2.inRange(frame, (20, 20, 190), (40, 40, 210))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        boxes = stats[1:, :4].astype(np.float32)
+        boxes[:, 2:] += boxes[:, :2]
+        if self.delay:
+            time.sleep(self.delay)
+        return np.hstack([boxes, np.ones((count - 1, 1), np.float32)])
+
+def yolo_detector(model):
+    from detectors import DetectorRegistry
+    detectors = DetectorRegistry()
+    return lambda frame: detectors.detect([frame], model, classes=[0], conf=0.3, verbose=False)[0]
+
+# ----------------- TRACKERS -----------------
+class HistogramEmbedder:
+    # Colour-histogram stand-in for the MobileNet re-ID model, so DeepSORT runs without torch
+    def predict(self, crops):
+        embeds = []
+        for crop in crops:
+            hist = cv2.calcHist([crop], [0, 1, 2], None, [4, 4, 4], [0, 256] * 3).ravel()
+            embeds.append(hist / (np.linalg.norm(hist) or 1.0))
+        return embeds
+
+def bench_tracker(name, embedder):
+    # The app's own tracker plugins; DeepSORT gets the histogram embedder unless mobilenet is asked for
+    config = dict(zone_app.app.config, REID_EMBEDDER="mobilenet" if embedder == "mobilenet" else None)
+    tracker = make_tracker(name, config)
+    if name == "deepsort" and embedder != "mobilenet":
+        tracker.tracker.deepsort.embedder = HistogramEmbedder()
+    return tracker
+
+# ----------------- RUN -----------------
+def default_zones(shape):
+    # Two rectangles and a tripwire down the middle, so zone counts and crossings both run
+    height, width = shape[:2]
+    return ({"zone_name": "left", "top_left_x": 0, "top_left_y": 0,
+             "bottom_right_x": width // 2, "bottom_right_y": height},
+            {"zone_name": "floor", "top_left_x": 0, "top_left_y": height * 2 // 3,
+             "bottom_right_x": width, "bottom_right_y": height},
+            {"zone_name": "middle", "top_left_x": width // 2, "top_left_y": 0,
+             "bottom_right_x": width // 2, "bottom_right_y": height,
+             "polygon": json.dumps([[width // 2, 0], [width // 2, height]])})
+
+def rss_mb():
+    # Current resident set size; falls back to the peak where /proc is unavailable
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1e3
+    return {"mean": round(float(ms.mean()), 3), "p50": round(float(np.percentile(ms, 50)), 3),
+            "p90": round(float(np.percentile(ms, 90)), 3), "p99": round(float(np.percentile(ms, 99)), 3),
+            "max": round(float(ms.max()), 3)}
+
+def step_means(name):
+    # Mean ms of the app's own track and zones timings for this run's engine (warm-up frames included)
+    means = {}
+    for step in ANALYZE_STEPS:
+        counts, total = STAGE_SECONDS.values.get((name, step), ([0], 0.0))
+        means[step] = round(total / max(sum(counts), 1) * 1e3, 3)
+    return means
+
+def run(frames, detect, engine, profile, warmup):
+    # The app's per-frame path, called exactly as the inference and encoder threads call it:
+    # detect -> app.analyze_frame (track, draw, zones, crossings, heatmap) -> engine publish (JPEG encode)
+    timings = {stage: [] for stage in STAGES}
+    totals, tracked = [], 0
+    subscription = engine.subscribe(profile)
+    rss_before = rss_mb()
+    started = None
+    for i, source in enumerate(frames):
+        if i == warmup:
+            started = time.perf_counter()
+        marks = [time.perf_counter()]
+        frame = source.copy()
+        marks.append(time.perf_counter())
+        detections = detect(frame)
+        marks.append(time.perf_counter())
+        frame, counts = zone_app.analyze_frame(engine, frame, detections)
+        marks.append(time.perf_counter())
+        engine._publish(frame, counts)
+        marks.append(time.perf_counter())
+        if i < warmup:
+            continue
+        tracked += ACTIVE_TRACKS.values.get((engine.name,), 0)
+        for stage, start, stop in zip(STAGES, marks, marks[1:]):
+            timings[stage].append(stop - start)
+        totals.append(marks[-1] - marks[0])
+    elapsed = time.perf_counter() - started
+    subscription.close()
+    measured = len(totals)
+    return {
+        "frames": measured,
+        "fps": round(measured / elapsed, 2),
+        "latency_ms": percentiles(totals),
+        "stages_ms": {stage: percentiles(samples) for stage, samples in timings.items()},
+        "analyze_steps_mean_ms": step_means(engine.name),
+        "mean_tracks": round(tracked / measured, 2),
+        "memory_mb": {"rss_before": round(rss_before, 1), "rss_after": round(rss_mb(), 1),
+                      "peak_rss": round(peak_rss_mb(), 1)},
+    }
+
+# ----------------- REGRESSIONS -----------------
+def regressions(result, baseline, tolerance):
+    # FPS below, or p90 end-to-end latency above, the baseline by more than `tolerance`
+    problems = []
+    if result["fps"] < baseline["fps"] * (1 - tolerance):
+        problems.append(f"fps {result['fps']} < baseline {baseline['fps']}")
+    if result["latency_ms"]["p90"] > baseline["latency_ms"]["p90"] * (1 + tolerance):
+        problems.append(f"p90 latency {result['latency_ms']['p90']} ms > baseline {baseline['latency_ms']['p90']} ms")
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline latency, FPS and memory, headless")
+    parser.add_argument("--clip", help="recorded video; default is the synthetic test pattern")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20, help="leading frames left out of the statistics")
+    parser.add_argument("--size", default="1280x720", help="test pattern resolution")
+    parser.add_argument("--people", type=int, default=20, help="figures in the test pattern")
+    parser.add_argument("--detector", choices=["stub", "yolo"], default="stub")
+    parser.add_argument("--detect-ms", type=float, default=0.0, help="extra simulated cost per stub detection")
+    parser.add_argument("--model", choices=["n", "s", "m"], default=None, help="YOLOv8 size for --detector yolo")
+    parser.add_argument("--trackers", default="centroid,assignment,bytetrack,deepsort")
+    parser.add_argument("--embedder", choices=["histogram", "mobilenet"], default="histogram",
+                        help="DeepSORT re-ID model; mobilenet needs torch")
+    parser.add_argument("--width", type=int, default=None, help="encoded stream width, default native")
+    parser.add_argument("--quality", type=int, default=95)
+    parser.add_argument("--box-shrink", type=float, default=zone_app.app.config["BOX_SHRINK"],
+                        help="the app's BOX_SHRINK, e.g. 0.6 for the DeepSORT preset")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per run")
+    parser.add_argument("--out", help="also write all runs to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from --out; exit 1 when a run regresses against it")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.lower().split("x"))
+    frames = load_frames(args.clip, args.frames + args.warmup, width, height, args.people)
+    detect = StubDetector(args.detect_ms) if args.detector == "stub" else yolo_detector(args.model)
+    zones = default_zones(frames[0].shape)
+    zone_app.zone_cache.load = lambda: zones   # the benchmark's zones instead of the database's
+    zone_app.zone_cache.reload()
+    zone_app.app.config["BOX_SHRINK"] = args.box_shrink
+    profile = StreamProfile(args.width, args.quality, 0)
+    config = {"clip": args.clip or f"test pattern {args.size}, {args.people} people", "detector": args.detector,
+              "detect_ms": args.detect_ms, "width": args.width, "quality": args.quality,
+              "box_shrink": args.box_shrink,
+              "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+    runs, failed = [], []
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {run["tracker"]: run for run in json.load(f)["runs"]}
+    for name in args.trackers.split(","):
+        engine = AnalyticsEngine(f"bench-{name}", zone_app.analyze_frame, tracker=bench_tracker(name, args.embedder))
+        config["encoder"] = engine.streams.encoder.name
+        result = {"tracker": name}
+        result.update(run(frames, detect, engine, profile, args.warmup))
+        if name in baseline:
+            result["regressions"] = regressions(result, baseline[name], args.tolerance)
+            failed += result["regressions"]
+        runs.append(result)
+        if args.json:
+            print(json.dumps(dict(result, config=config)))
+        else:
+            stages = "  ".join(f"{stage} {result['stages_ms'][stage]['p50']:.2f}" for stage in STAGES)
+            print(f"{name:<11} {result['fps']:>7.1f} FPS  latency p50 {result['latency_ms']['p50']:.2f} "
+                  f"p99 {result['latency_ms']['p99']:.2f} ms  [{stages}]  "
+                  f"peak RSS {result['memory_mb']['peak_rss']:.0f} MB")
+            for problem in result.get("regressions", []):
+                print(f"  REGRESSION {problem}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": config, "runs": runs}, f, indent=2)
+    sys.exit(1 if failed else 0)
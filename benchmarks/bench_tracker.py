@@ -0,0 +1,72 @@
+import argparse, json, time
+import numpy as np
+from tracking import AssignmentTracker, CentroidTracker
+
+# ----------------- SYNTHETIC CROWD -----------------
+def synthetic_crowd(count, frames, width=1920, height=1080, seed=0):
+    # Yields per-frame (x, y, w, h) detections plus the ground-truth identity of each detection
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform((0, 0), (width, height), size=(count, 2))
+    velocities = rng.normal(0, 3, size=(count, 2))
+    sizes = rng.uniform((25, 60), (45, 120), size=(count, 2))
+    for _ in range(frames):
+        velocities = 0.95 * velocities + rng.normal(0, 0.3, size=velocities.shape)
+        positions += velocities
+        bounce = (positions < 0) | (positions > (width, height))
+        velocities[bounce] *= -1
+        positions = np.clip(positions, 0, (width, height))
+        jitter = rng.normal(0, 1.5, size=positions.shape)
+        visible = rng.random(count) > 0.05
+        centres = (positions + jitter)[visible]
+        rects = np.hstack([centres - sizes[visible] / 2, sizes[visible]]).astype(int)
+        yield rects, np.flatnonzero(visible)
+
+def id_switches(history):
+    # Times a ground-truth person is reported under a different tracker ID than last time
+    last, switches = {}, 0
+    for truth, track_id in history:
+        if truth in last and last[truth] != track_id:
+            switches += 1
+        last[truth] = track_id
+    return switches
+
+def run(tracker, count, frames):
+    timings, history = [], []
+    for rects, truth in synthetic_crowd(count, frames):
+        start = time.perf_counter()
+        tracks = tracker.update([tuple(r) for r in rects])
+        timings.append(time.perf_counter() - start)
+        # Tracks carry the detection box they matched, so identity can be read off directly
+        boxes = tracks["box"]
+        inputs = np.hstack([rects[:, :2], rects[:, :2] + rects[:, 2:]])
+        for gt, box in zip(truth, inputs):
+            hit = np.flatnonzero((boxes == box).all(axis=1))
+            if len(hit):
+                history.append((int(gt), int(tracks["id"][hit[0]])))
+    timings = np.array(timings[1:]) * 1e3
+    return {
+        "tracker": type(tracker).__name__,
+        "objects": count,
+        "frames": frames,
+        "mean_ms": round(float(timings.mean()), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+        "updates_per_s": round(1e3 / float(timings.mean()), 1),
+        "id_switches": id_switches(history),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tracker throughput at increasing crowd sizes")
+    parser.add_argument("--sizes", default="10,100,500")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per run")
+    args = parser.parse_args()
+
+    for count in map(int, args.sizes.split(",")):
+        for tracker in (CentroidTracker(), AssignmentTracker()):
+            result = run(tracker, count, args.frames)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{result['tracker']:<18} n={count:<4} {result['mean_ms']:>8.3f} ms/frame "
+                      f"p95 {result['p95_ms']:>8.3f} ms  {result['updates_per_s']:>9.1f} updates/s  "
+                      f"id switches {result['id_switches']}")
@@ -0,0 +1,42 @@
+import numpy as np
+
+# ----------------- DETECTION CADENCE -----------------
+class DetectionCadence:
+    # Decides which frames get a detector pass; the tracker predicts positions on the others.
+    # Adaptive mode halves the interval when people move fast or the crowd size jumps,
+    # and stretches it again one frame at a time while the scene is steady.
+    def __init__(self, interval=1, adaptive=False, max_interval=8, motion_threshold=0.05, count_threshold=0.2):
+        self.interval = max(1, interval)
+        self.adaptive = adaptive
+        self.max_interval = max(max_interval, self.interval)
+        self.motion_threshold = motion_threshold
+        self.count_threshold = count_threshold
+        self.countdown = 0
+        self.last_count = None
+
+    def should_detect(self):
+        if self.countdown <= 0:
+            return True
+        self.countdown -= 1
+        return False
+
+    def observe(self, tracks):
+        # Called after each detection with the freshly matched tracks
+        if self.adaptive:
+            count = len(tracks)
+            if len(tracks):
+                # Speed relative to body height, so near and far people weigh the same
+                heights = np.maximum(tracks["box"][:, 3] - tracks["box"][:, 1], 1)
+                motion = float(np.median(np.hypot(*tracks["velocity"].T) / heights))
+            else:
+                motion = 0.0
+            change = abs(count - self.last_count) / max(self.last_count, 1) if self.last_count is not None else 0.0
+            if motion * self.interval > self.motion_threshold or change > self.count_threshold:
+                self.interval = max(1, self.interval // 2)
+            else:
+                self.interval = min(self.max_interval, self.interval + 1)
+            self.last_count = count
+        self.countdown = self.interval - 1
+
+    def status(self):
+        return {"interval": self.interval, "adaptive": self.adaptive}
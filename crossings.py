@@ -0,0 +1,183 @@
+import threading, time
+from collections import deque
+import numpy as np
+
+# ----------------- GEOMETRY -----------------
+def side(lines, points):
+    # Cross product of each line's direction with the point: > 0 right of A -> B in image coordinates.
+    # lines (L, 4) ax, ay, bx, by; points (N, 2) -> (N, L)
+    ax, ay, bx, by = lines.T
+    return (bx - ax) * (points[:, 1:2] - ay) - (by - ay) * (points[:, 0:1] - ax)
+
+def crossings(lines, start, end):
+    # (N, L) +1 where start -> end crosses a line from its left to its right, -1 right to left, 0 otherwise
+    before, after = side(lines, start) >= 0, side(lines, end) >= 0
+    moved = end - start
+    # The line's endpoints must also straddle the movement, or the track passed beyond the line's ends
+    a = moved[:, 0:1] * (lines[:, 1] - start[:, 1:2]) - moved[:, 1:2] * (lines[:, 0] - start[:, 0:1])
+    b = moved[:, 0:1] * (lines[:, 3] - start[:, 1:2]) - moved[:, 1:2] * (lines[:, 2] - start[:, 0:1])
+    hit = (before != after) & (a * b <= 0)
+    return np.where(hit, np.where(after, 1, -1), 0)
+
+# ----------------- CROSSING COUNTER -----------------
+class CrossingCounter:
+    # Incremental per-track state for one source: the foot point each track was last seen at, the zones
+    # it was inside and how long it has been there, all in arrays indexed by a recycled slot per track.
+    # A frame only compares the current tracks with their own previous state, so the cost is
+    # O(tracks x (zones + lines)) however long the source has been running.
+    # Tracks appearing inside a zone or vanishing from one start and end a visit without counting
+    # an entry or exit, so tracker ID switches do not inflate throughput.
+    # Trackers only report tracks matched on the current frame, so a track missing for up to `grace`
+    # frames keeps its state (and its visit) until the tracker would have dropped its ID.
+    def __init__(self, capacity=64, dwell_samples=256, max_events=500, grace=40):
+        self.lock = threading.Lock()
+        self.dwell_samples = dwell_samples
+        self.grace = grace
+        self.key = None
+        self.zone_names, self.line_names = [], []
+        self.slots = {}   # track id -> row in the arrays below
+        self.free = []
+        self.points = np.zeros((capacity, 2), np.float32)
+        self.seen = np.zeros(capacity)   # timestamp each slot was last updated
+        self.missing = np.zeros(capacity, np.int32)   # consecutive frames each slot's track was not reported
+        self.inside = np.zeros((capacity, 0), bool)
+        self.dwell = np.zeros((capacity, 0), np.float32)   # seconds in each zone during the current visit
+        self.entered = np.zeros(0, np.int64)
+        self.exited = np.zeros(0, np.int64)
+        self.line_in = np.zeros(0, np.int64)
+        self.line_out = np.zeros(0, np.int64)
+        self.visits = np.zeros(0, np.int64)   # finished visits per zone
+        self.dwell_total = np.zeros(0)
+        self.recent_dwell = np.zeros((0, dwell_samples), np.float32)   # ring of the latest finished visits
+        self.events = deque(maxlen=max_events)
+        self.version = 0   # bumped by every event, so publishers can tell when totals changed
+
+    def _configure(self, zone_names, line_names):
+        # Zones or tripwires changed: totals, the dwell ring and the visits in progress carry over by name,
+        # so people already inside a zone that survived the edit still leave it with an exit and a dwell.
+        # Tracks keep their slots; removed zones and lines drop their state, new ones start empty.
+        def carry(old_names, new_names, values):
+            old = {name: i for i, name in enumerate(old_names)}
+            carried = np.zeros((len(new_names),) + values.shape[1:], values.dtype)
+            for i, name in enumerate(new_names):
+                if name in old:
+                    carried[i] = values[old[name]]
+            return carried
+        self.entered = carry(self.zone_names, zone_names, self.entered)
+        self.exited = carry(self.zone_names, zone_names, self.exited)
+        self.visits = carry(self.zone_names, zone_names, self.visits)
+        self.dwell_total = carry(self.zone_names, zone_names, self.dwell_total)
+        self.recent_dwell = carry(self.zone_names, zone_names, self.recent_dwell)
+        self.inside = carry(self.zone_names, zone_names, self.inside.T).T.copy()
+        self.dwell = carry(self.zone_names, zone_names, self.dwell.T).T.copy()
+        self.line_in = carry(self.line_names, line_names, self.line_in)
+        self.line_out = carry(self.line_names, line_names, self.line_out)
+        self.zone_names, self.line_names = list(zone_names), list(line_names)
+
+    def _grow(self):
+        capacity = len(self.points)
+        self.points = np.vstack([self.points, np.zeros_like(self.points)])
+        self.seen = np.concatenate([self.seen, np.zeros(capacity)])
+        self.missing = np.concatenate([self.missing, np.zeros(capacity, np.int32)])
+        self.inside = np.vstack([self.inside, np.zeros_like(self.inside)])
+        self.dwell = np.vstack([self.dwell, np.zeros_like(self.dwell)])
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _finish(self, slots, zones):
+        # Close visits: record their dwell and clear the per-slot state
+        for slot, zone in zip(slots.tolist(), zones.tolist()):
+            seconds = float(self.dwell[slot, zone])
+            self.recent_dwell[zone, self.visits[zone] % self.dwell_samples] = seconds
+            self.visits[zone] += 1
+            self.dwell_total[zone] += seconds
+        self.inside[slots, zones] = False
+        self.dwell[slots, zones] = 0.0
+
+    def update(self, track_ids, boxes, membership, index, timestamp=None):
+        # track_ids (N,), boxes (N, 4) x1, y1, x2, y2 and membership (N, Z) from index.assign on this frame
+        now = time.time() if timestamp is None else timestamp
+        ids = np.asarray(track_ids).tolist()
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        feet = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+        with self.lock:
+            if self.key is not index:
+                self._configure(index.names, index.line_names)
+                self.key = index
+
+            # Tracks not reported for more than `grace` frames end their visits and give their slot back
+            current = set(ids)
+            absent = [track_id for track_id in self.slots if track_id not in current]
+            if absent:
+                self.missing[[self.slots[track_id] for track_id in absent]] += 1
+                gone = [track_id for track_id in absent if self.missing[self.slots[track_id]] > self.grace]
+                if gone:
+                    freed = np.array([self.slots.pop(track_id) for track_id in gone])
+                    rows, zones = np.nonzero(self.inside[freed])
+                    self._finish(freed[rows], zones)
+                    self.free.extend(freed.tolist())
+
+            known = np.array([track_id in self.slots for track_id in ids], dtype=bool)
+            for track_id in (i for i, k in zip(ids, known) if not k):
+                if not self.free:
+                    self._grow()
+                self.slots[track_id] = self.free.pop()
+            slots = np.array([self.slots[track_id] for track_id in ids], dtype=np.intp)
+            events = []
+
+            old = slots[known]
+            if len(old) and len(self.line_names):
+                direction = crossings(index.lines, self.points[old], feet[known])
+                self.line_in += (direction > 0).sum(axis=0)
+                self.line_out += (direction < 0).sum(axis=0)
+                rows = np.flatnonzero(known)
+                for row, line in zip(*np.nonzero(direction)):
+                    events.append((now, ids[rows[row]], "in" if direction[row, line] > 0 else "out",
+                                   self.line_names[line]))
+
+            if len(self.zone_names):
+                was = self.inside[slots] & known[:, None]
+                elapsed = np.where(known, now - self.seen[slots], 0.0).astype(np.float32)
+                self.dwell[slots] += np.where(was & membership, elapsed[:, None], 0.0)
+                entered = membership & ~was & known[:, None]
+                exited = was & ~membership
+                self.entered += entered.sum(axis=0)
+                self.exited += exited.sum(axis=0)
+                rows, zones = np.nonzero(exited)
+                self._finish(slots[rows], zones)
+                self.inside[slots] = membership
+                for kind, hits in (("enter", entered), ("exit", exited)):
+                    for row, zone in zip(*np.nonzero(hits)):
+                        events.append((now, ids[row], kind, self.zone_names[zone]))
+
+            self.points[slots] = feet
+            self.seen[slots] = now
+            self.missing[slots] = 0
+            if events:
+                self.events.extend(events)
+                self.version += 1
+            return events
+
+    def totals(self):
+        with self.lock:
+            inside = self.inside[list(self.slots.values())]
+            dwell = self.dwell[list(self.slots.values())]
+            zones = {}
+            for i, name in enumerate(self.zone_names):
+                recent = self.recent_dwell[i, :min(self.visits[i], self.dwell_samples)]
+                current = dwell[inside[:, i], i]
+                zones[name] = {
+                    "entered": int(self.entered[i]),
+                    "exited": int(self.exited[i]),
+                    "visits": int(self.visits[i]),
+                    "dwell_avg": round(float(self.dwell_total[i] / self.visits[i]), 2) if self.visits[i] else None,
+                    "dwell_p95": round(float(np.percentile(recent, 95)), 2) if len(recent) else None,
+                    "dwell_now_max": round(float(current.max()), 2) if len(current) else None,
+                }
+            lines = {name: {"in": int(self.line_in[i]), "out": int(self.line_out[i])}
+                     for i, name in enumerate(self.line_names)}
+            return {"zones": zones, "lines": lines}
+
+    def recent(self, since=0.0):
+        with self.lock:
+            return [{"ts": round(ts, 3), "track": track_id, "event": kind, "name": name}
+                    for ts, track_id, kind, name in self.events if ts > since]
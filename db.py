@@ -0,0 +1,230 @@
+import os, queue, sqlite3, threading
+from contextlib import contextmanager
+from metrics import db_query
+
+# ----------------- CONFIG -----------------
+MYSQL_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "user": os.environ.get("DB_USER", "root"),
+    "password": os.environ.get("DB_PASSWORD", "root"),
+    "database": os.environ.get("DB_NAME", "zone_app_db"),
+}
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "zone_app.db")
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    email TEXT,
+    contact TEXT
+);
+CREATE TABLE IF NOT EXISTS zones_data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    zone_name TEXT NOT NULL,
+    top_left_x INTEGER NOT NULL,
+    top_left_y INTEGER NOT NULL,
+    bottom_right_x INTEGER NOT NULL,
+    bottom_right_y INTEGER NOT NULL,
+    source_name TEXT,
+    polygon TEXT
+);
+"""
+
+# ----------------- BACKENDS -----------------
+class MySQLBackend:
+    name = "mysql"
+
+    def __init__(self, config=None):
+        self.config = config or MYSQL_CONFIG
+
+    def connect(self):
+        import mysql.connector
+        # autocommit so a pooled connection never keeps reading from an old transaction snapshot
+        return mysql.connector.connect(autocommit=True, **self.config)
+
+    def prepare(self, sql):
+        return sql
+
+    def cursor(self, conn):
+        # Server-side prepared statement; re-executing the same SQL on this cursor skips the re-parse
+        return conn.cursor(prepared=True)
+
+    def check(self, conn):
+        return conn.is_connected()
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        self.initialized = False
+        self.lock = threading.Lock()
+
+    def connect(self):
+        uri = self.path.startswith("file:")
+        conn = sqlite3.connect(self.path, uri=uri, check_same_thread=False, cached_statements=64)
+        with self.lock:
+            if not self.initialized:
+                conn.executescript(SQLITE_SCHEMA)
+                self.initialized = True
+        return conn
+
+    def prepare(self, sql):
+        return sql.replace("%s", "?")
+
+    def cursor(self, conn):
+        # sqlite3 keeps its own per-connection prepared statement cache
+        return conn.cursor()
+
+    def check(self, conn):
+        return True
+
+# ----------------- CONNECTION POOL -----------------
+class ConnectionPool:
+    def __init__(self, backend, size=POOL_SIZE, timeout=10):
+        self.backend = backend
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+        self.slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise TimeoutError("database connection pool exhausted")
+        try:
+            try:
+                pooled = self.idle.get_nowait()
+            except queue.Empty:
+                pooled = None
+            if pooled is not None and not self.backend.check(pooled.conn):
+                pooled.close()
+                pooled = None
+            if pooled is None:
+                pooled = PooledConnection(self.backend, self.backend.connect())
+            try:
+                yield pooled
+            except Exception:
+                pooled.close()
+                raise
+            else:
+                self.idle.put_nowait(pooled)
+        finally:
+            self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class PooledConnection:
+    def __init__(self, backend, conn):
+        self.backend = backend
+        self.conn = conn
+        self.statements = {}
+
+    def execute(self, sql, params=()):
+        cursor = self.statements.get(sql)
+        if cursor is None:
+            cursor = self.statements[sql] = self.backend.cursor(self.conn)
+        with db_query(self.backend.name, sql):
+            cursor.execute(self.backend.prepare(sql), params)
+        return cursor
+
+    def fetchall(self, sql, params=()):
+        cursor = self.execute(sql, params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def fetchone(self, sql, params=()):
+        rows = self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+pool = None
+pool_lock = threading.RLock()
+
+def configure(backend=None, size=POOL_SIZE):
+    global pool
+    if backend is None:
+        backend = SQLiteBackend() if os.environ.get("DB_BACKEND") == "sqlite" else MySQLBackend()
+    with pool_lock:
+        if pool is not None:
+            pool.close()
+        pool = ConnectionPool(backend, size)
+    return pool
+
+def get_pool():
+    if pool is None:
+        with pool_lock:
+            if pool is None:
+                return configure()
+    return pool
+
+# ----------------- USERS -----------------
+def find_user(username, email=None):
+    with get_pool().connection() as conn:
+        if email is None:
+            return conn.fetchone("SELECT * FROM users WHERE username=%s", (username,))
+        return conn.fetchone("SELECT * FROM users WHERE username=%s OR email=%s", (username, email))
+
+def create_user(username, password_hash, email=None, contact=None):
+    with get_pool().connection() as conn:
+        if email is None and contact is None:
+            conn.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, password_hash))
+        else:
+            conn.execute(
+                "INSERT INTO users (username, password, email, contact) VALUES (%s, %s, %s, %s)",
+                (username, password_hash, email, contact)
+            )
+        conn.commit()
+
+# ----------------- ZONES -----------------
+def list_zones():
+    with get_pool().connection() as conn:
+        return conn.fetchall("SELECT * FROM zones_data")
+
+def insert_zone(label, x1, y1, x2, y2, source=None, polygon=None):
+    # Optional columns are only written when used, so older schemas without them keep working
+    columns = ["zone_name", "top_left_x", "top_left_y", "bottom_right_x", "bottom_right_y"]
+    values = [label, x1, y1, x2, y2]
+    if source:
+        columns.append("source_name")
+        values.append(source)
+    if polygon:
+        columns.append("polygon")
+        values.append(polygon)
+    sql = (f"INSERT INTO zones_data ({', '.join(columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    with get_pool().connection() as conn:
+        conn.execute(sql, tuple(values))
+        conn.commit()
+
+def update_zone(label, x1, y1, x2, y2, polygon=None, clear_polygon=False):
+    # Like insert_zone, polygon is only written when the update touches it: new points, or
+    # clear_polygon when a polygon or tripwire zone is redrawn as a rectangle
+    columns = ["top_left_x", "top_left_y", "bottom_right_x", "bottom_right_y"]
+    values = [x1, y1, x2, y2]
+    if polygon or clear_polygon:
+        columns.append("polygon")
+        values.append(polygon or None)
+    sql = f"UPDATE zones_data SET {', '.join(c + '=%s' for c in columns)} WHERE zone_name=%s"
+    with get_pool().connection() as conn:
+        conn.execute(sql, tuple(values) + (label,))
+        conn.commit()
+
+def delete_zone(label):
+    with get_pool().connection() as conn:
+        conn.execute("DELETE FROM zones_data WHERE zone_name=%s", (label,))
+        conn.commit()
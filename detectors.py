@@ -0,0 +1,143 @@
+import os, shutil, threading, time
+import numpy as np
+
+# ----------------- CONFIG -----------------
+MODEL_SIZES = ("n", "s", "m")
+BACKENDS = ("torch", "onnx", "openvino")
+MODEL_DIR = os.environ.get("MODEL_DIR", "models")
+
+# ----------------- EXPORT CACHE -----------------
+def weights_name(size):
+    if size not in MODEL_SIZES:
+        raise ValueError(f"unknown model size {size!r}, expected one of {MODEL_SIZES}")
+    return f"yolov8{size}.pt"
+
+def export_path(size, backend, int8=False, model_dir=MODEL_DIR):
+    if backend == "torch":
+        return weights_name(size)
+    stem = os.path.join(model_dir, f"yolov8{size}" + ("-int8" if int8 else ""))
+    # ultralytics picks the runtime from the name: *.onnx or *_openvino_model/
+    return stem + ".onnx" if backend == "onnx" else stem + "_openvino_model"
+
+def export_model(size, backend, int8=False, model_dir=MODEL_DIR, imgsz=640, calibration=None):
+    # Exported once per (size, backend, int8) and reused from disk on every later start
+    path = export_path(size, backend, int8, model_dir)
+    if backend == "torch" or os.path.exists(path):
+        return path
+    from ultralytics import YOLO
+    os.makedirs(model_dir, exist_ok=True)
+    model = YOLO(weights_name(size))
+    # dynamic input shapes so the shared inference thread can still send one batch for all sources
+    if backend == "openvino":
+        # OpenVINO INT8 runs NNCF post-training quantization on the calibration dataset
+        extra = {"data": calibration} if int8 and calibration else {}
+        exported = model.export(format="openvino", dynamic=True, int8=int8, imgsz=imgsz, **extra)
+        shutil.move(exported, path)
+    else:
+        exported = model.export(format="onnx", dynamic=True, simplify=True, imgsz=imgsz)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, path, weight_type=QuantType.QUInt8)
+            os.remove(exported)
+        else:
+            shutil.move(exported, path)
+    return path
+
+# ----------------- DETECTORS -----------------
+def result_boxes(result):
+    # ultralytics result -> (N, 5) float32 array of x1, y1, x2, y2, conf
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 5), dtype=np.float32)
+    return np.hstack([boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy()[:, None]]).astype(np.float32)
+
+class Detector:
+    def __init__(self, size="m", backend="torch", int8=False, device=None, calibration=None):
+        from ultralytics import YOLO
+        started = time.perf_counter()
+        self.size = size
+        self.backend = backend
+        self.int8 = int8 and backend != "torch"
+        self.device = device
+        self.path = export_model(size, backend, self.int8, calibration=calibration)
+        # The same YOLO front end runs .pt, .onnx and OpenVINO models, so results look identical
+        self.model = YOLO(self.path, task="detect")
+        if device and backend == "torch":
+            self.model.to(device)
+        self.lock = threading.Lock()   # the warm-up thread and the inference thread share the model
+        self.load_seconds = time.perf_counter() - started
+        self.warmup_seconds = None
+
+    def __call__(self, frames, **kwargs):
+        if self.device:
+            kwargs.setdefault("device", self.device)
+        with self.lock:
+            return self.model(frames, **kwargs)
+
+    def warmup(self, imgsz=640):
+        # One inference on a blank image: builds the predictor, fuses layers and runs the backend's
+        # first-call graph setup, so a source's first real frame does not pay for it
+        if self.warmup_seconds is None:
+            started = time.perf_counter()
+            self(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False)
+            self.warmup_seconds = time.perf_counter() - started
+
+    def fuse(self):
+        # Folds batch norm into the convolutions now instead of on the first predict, which would
+        # rewrite every weight tensor. Exported models have no torch graph; their runtime session
+        # is only built by the first predict, in whichever process runs it.
+        if self.backend == "torch":
+            with self.lock:
+                self.model.fuse()
+
+    def status(self):
+        return {"size": self.size, "backend": self.backend, "int8": self.int8, "path": self.path,
+                "load_seconds": round(self.load_seconds, 3),
+                "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None}
+
+class DetectorRegistry:
+    # One loaded model per size; sources that ask for the same size share it
+    def __init__(self, backend=None, int8=None, default_size=None, device=None, calibration=None):
+        self.backend = backend or os.environ.get("DETECTOR_BACKEND", "torch")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"unknown detector backend {self.backend!r}, expected one of {BACKENDS}")
+        self.int8 = os.environ.get("DETECTOR_INT8") == "1" if int8 is None else int8
+        self.default_size = default_size or os.environ.get("MODEL_SIZE", "m")
+        weights_name(self.default_size)
+        self.device = device or os.environ.get("DETECTOR_DEVICE") or None
+        self.calibration = calibration or os.environ.get("INT8_CALIBRATION_DATA") or None
+        self.lock = threading.Lock()
+        self.detectors = {}
+        self.loading = {}   # size -> lock held while that size loads
+
+    def get(self, size=None):
+        # Loading (and exporting) one size can take many seconds; it holds only that size's lock,
+        # so sources on models already loaded keep detecting meanwhile
+        size = size or self.default_size
+        with self.lock:
+            detector = self.detectors.get(size)
+            if detector is not None:
+                return detector
+            loading = self.loading.setdefault(size, threading.Lock())
+        with loading:
+            with self.lock:
+                detector = self.detectors.get(size)
+            if detector is None:
+                detector = Detector(size, self.backend, self.int8, self.device, self.calibration)
+                with self.lock:
+                    self.detectors[size] = detector
+                    self.loading.pop(size, None)
+            return detector
+
+    def detect(self, frames, size=None, **kwargs):
+        return [result_boxes(result) for result in self.get(size)(frames, **kwargs)]
+
+    def preload(self, size=None):
+        self.get(size).fuse()
+
+    def warmup(self, size=None):
+        self.get(size).warmup()
+
+    def status(self):
+        with self.lock:
+            return [detector.status() for detector in self.detectors.values()]
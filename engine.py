@@ -0,0 +1,339 @@
+import json, queue, threading, time
+from collections import namedtuple
+from cadence import DetectionCadence
+from encoding import make_encoder, resize_to_width, stream_profile
+from crossings import CrossingCounter
+from heatmap import HeatmapGrid
+from metrics import FRAMES, FRAMES_DROPPED, MOTION_ENERGY, QUEUE_DEPTH, REGISTRY, SOURCE_STREAMING, SUBSCRIBERS, stage
+from pipeline import STREAMING, BatchInferenceWorker, CaptureWorker, EncoderWorker, put_latest
+
+FrameResult = namedtuple("FrameResult", ["frame_id", "timestamp", "jpeg", "counts"])
+CountUpdate = namedtuple("CountUpdate", ["frame_id", "timestamp", "counts", "flow"])
+
+# ----------------- FAN-OUT -----------------
+class Subscription:
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.queue = queue.Queue(maxsize=1)
+        self.max_fps = 0
+
+    def get(self, timeout=1.0):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+class Broadcaster:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.latest = None
+
+    def subscribe(self):
+        sub = Subscription(self)
+        with self.lock:
+            self.subscribers.append(sub)
+            latest = self.latest
+        if latest is not None:
+            put_latest(sub.queue, latest)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            if sub in self.subscribers:
+                self.subscribers.remove(sub)
+
+    def publish(self, result):
+        with self.lock:
+            self.latest = result
+            subscribers = list(self.subscribers)
+        # Slow subscribers only ever miss intermediate frames; they never hold up the engine
+        for sub in subscribers:
+            put_latest(sub.queue, result)
+
+class EncodedStreams:
+    # One Broadcaster per (width, quality) variant. A variant is resized and encoded once per frame
+    # for all of its subscribers, only while someone watches it, and no faster than its fastest
+    # subscriber's frame-rate cap.
+    def __init__(self, encoder=None):
+        self.encoder = encoder or make_encoder()
+        self.lock = threading.Lock()
+        self.variants = {}
+        self.last_encoded = {}
+
+    def subscribe(self, profile):
+        with self.lock:
+            broadcaster = self.variants.setdefault((profile.width, profile.quality), Broadcaster())
+        sub = broadcaster.subscribe()
+        sub.max_fps = profile.max_fps
+        return sub
+
+    def publish(self, frame_id, timestamp, frame, counts):
+        now = time.monotonic()
+        with self.lock:
+            variants = list(self.variants.items())
+        resized = {}
+        for key, broadcaster in variants:
+            with broadcaster.lock:
+                caps = [sub.max_fps for sub in broadcaster.subscribers]
+            if not caps:
+                continue
+            interval = 0.0 if 0 in caps else 1.0 / max(caps)
+            if now - self.last_encoded.get(key, 0.0) < interval:
+                continue
+            width, quality = key
+            if width not in resized:
+                resized[width] = resize_to_width(frame, width)
+            jpeg = self.encoder.encode(resized[width], quality)
+            if jpeg is not None:
+                broadcaster.publish(FrameResult(frame_id, timestamp, jpeg, counts))
+                self.last_encoded[key] = now
+
+    def subscriber_count(self):
+        with self.lock:
+            return sum(len(b.subscribers) for b in self.variants.values())
+
+    def status(self):
+        with self.lock:
+            return {f"{width or 'native'}@q{quality}": len(b.subscribers)
+                    for (width, quality), b in self.variants.items() if b.subscribers}
+
+# ----------------- ANALYTICS ENGINE -----------------
+class AnalyticsEngine:
+    def __init__(self, name, analyze, tracker=None, cadence=None, model=None, detector=None, region=None,
+                 motion=None, recorder=None):
+        self.name = name
+        self.analyze = analyze
+        self.tracker = tracker
+        self.cadence = cadence or DetectionCadence()
+        self.model = model   # detector model size; None uses the app default
+        self.detector = detector   # detector plugin name; None uses the app default
+        self.region = region   # RegionCropper limiting detection to the zones; None detects the full frame
+        self.motion = motion   # MotionGate skipping detection while the zones are still; None always detects
+        self.recorder = recorder   # called with (name, counts, timestamp) for every published frame
+        self.streams = EncodedStreams()   # encoded MJPEG variants, one per watched profile
+        self.count_events = Broadcaster()   # only fires when the counts change
+        self.heatmap = HeatmapGrid()   # decaying foot-point density, fed by analyze
+        # Tripwire and zone enter/exit totals, fed by analyze; per-track state outlives short gaps
+        # for as long as the tracker keeps an unmatched ID
+        self.crossings = CrossingCounter(grace=getattr(tracker, "max_missing", 40))
+        self.flow_version = 0
+        self.last_counts = None
+        self.frame_id = 0
+        self.raw_frames = queue.Queue(maxsize=1)
+        self.processed_frames = queue.Queue(maxsize=1)
+        self.capture_worker = CaptureWorker(name, self.raw_frames)
+        self.encoder_worker = EncoderWorker(name, self.processed_frames, self._publish)
+
+    def _publish(self, frame, counts):
+        self.frame_id += 1
+        timestamp = time.time()
+        with stage(self.name, "encode"):
+            self.streams.publish(self.frame_id, timestamp, frame, counts)
+        FRAMES.inc(source=self.name, outcome="published")
+        if counts != self.last_counts or self.crossings.version != self.flow_version:
+            self.last_counts = counts
+            self.flow_version = self.crossings.version
+            self.count_events.publish(CountUpdate(self.frame_id, timestamp, counts, self.crossings.totals()))
+        if self.recorder:
+            self.recorder(self.name, counts, timestamp)
+
+    def windows(self, shape):
+        if self.region is None:
+            return [(0, 0, shape[1], shape[0])]
+        return self.region.windows(shape)
+
+    def process(self, frame, detections):
+        # Called from the shared inference thread; detections is None on frames the cadence skipped
+        # and HOLD on frames the motion gate skipped
+        with stage(self.name, "analyze"):
+            result = self.analyze(self, frame, detections)
+        if put_latest(self.processed_frames, result):
+            FRAMES_DROPPED.inc(source=self.name, queue="processed")
+
+    def stage(self, name):
+        # Times one step of analyze (tracking, zone counting) under this source's name
+        return stage(self.name, name)
+
+    def open(self, uri, on_eof="loop", playlist=()):
+        # Returns at once; the capture thread connects, and reconnects, in the background
+        self.capture_worker.set_source(uri, on_eof, playlist)
+        self.capture_worker.start()
+        self.encoder_worker.start()
+
+    def stop(self):
+        self.capture_worker.stop()
+        self.encoder_worker.stop()
+
+    def subscribe(self, profile=None):
+        return self.streams.subscribe(profile or stream_profile())
+
+    @property
+    def counts(self):
+        return self.last_counts or {}
+
+    def status(self):
+        health = self.capture_worker.status()
+        return {
+            "name": self.name,
+            "kind": health["kind"],
+            "health": health,
+            "frames": self.frame_id,
+            "model": self.model,
+            "detector": self.detector,
+            "windows": self.region.cached if self.region else None,
+            "cadence": self.cadence.status(),
+            "motion": self.motion.status() if self.motion else None,
+            "tracker": self.tracker.status() if hasattr(self.tracker, "status") else None,
+            "subscribers": self.streams.subscriber_count(),
+            "streams": self.streams.status(),
+            "encoder": self.streams.encoder.name,
+            "count_subscribers": len(self.count_events.subscribers),
+        }
+
+# ----------------- SOURCE REGISTRY -----------------
+class EngineRegistry:
+    def __init__(self, detect_batch, create_engine, ready=None):
+        self.create_engine = create_engine
+        self.lock = threading.Lock()
+        self.engines = {}
+        self.inference_worker = BatchInferenceWorker(detect_batch, self.all, ready=ready)
+        REGISTRY.on_collect(self.collect_metrics)
+
+    def all(self):
+        with self.lock:
+            return list(self.engines.values())
+
+    def get(self, name):
+        with self.lock:
+            return self.engines.get(name)
+
+    def get_or_create(self, name):
+        with self.lock:
+            engine = self.engines.get(name)
+            if engine is None:
+                engine = self.create_engine(name)
+                engine.capture_worker.on_frame = self.inference_worker.notify
+                self.engines[name] = engine
+            return engine
+
+    def open(self, name, uri, model=None, on_eof="loop", playlist=(), tracker=None, detector=None):
+        engine = self.get_or_create(name)
+        if model:
+            engine.model = model
+        if detector:
+            engine.detector = detector
+        if tracker is not None:
+            # Swapped between frames; the inference thread picks it up on its next frame. The new
+            # tracker numbers its IDs afresh, so per-track crossing state keyed by the old IDs goes
+            # with it (the totals restart too) and the next frame detects instead of predicting.
+            engine.crossings = CrossingCounter(grace=getattr(tracker, "max_missing", 40))
+            engine.tracker = tracker
+            engine.cadence.countdown = 0
+        engine.open(uri, on_eof, playlist)
+        self.inference_worker.start()
+        return engine
+
+    def remove(self, name):
+        with self.lock:
+            engine = self.engines.pop(name, None)
+        if engine is None:
+            return False
+        engine.stop()
+        return True
+
+    def status(self):
+        # The inference thread serves every source, so a dead or failing one shows in each source's health
+        inference = self.inference_worker.health()
+        statuses = []
+        for engine in self.all():
+            status = engine.status()
+            error = self.inference_worker.source_errors.get(engine.name)
+            status["health"]["inference"] = dict(inference, source_error=error[1] if error else None,
+                                                 source_error_at=round(error[0], 3) if error else None)
+            statuses.append(status)
+        return statuses
+
+    def collect_metrics(self):
+        # Point-in-time gauges, refreshed on every scrape; removed sources drop out
+        for gauge in (QUEUE_DEPTH, SUBSCRIBERS, SOURCE_STREAMING, MOTION_ENERGY):
+            gauge.clear()
+        for engine in self.all():
+            QUEUE_DEPTH.set(engine.raw_frames.qsize(), source=engine.name, queue="raw")
+            QUEUE_DEPTH.set(engine.processed_frames.qsize(), source=engine.name, queue="processed")
+            SUBSCRIBERS.set(engine.streams.subscriber_count(), source=engine.name, stream="video")
+            SUBSCRIBERS.set(len(engine.count_events.subscribers), source=engine.name, stream="counts")
+            SOURCE_STREAMING.set(int(engine.capture_worker.state == STREAMING), source=engine.name)
+            if engine.motion is not None:
+                for zone, energy in dict(engine.motion.energy).items():
+                    MOTION_ENERGY.set(energy, source=engine.name, zone=zone)
+
+# ----------------- MJPEG -----------------
+def mjpeg_stream(engine, profile=None):
+    # Per-client frame-rate cap: sleep out the interval, then take whatever frame is newest
+    profile = profile or stream_profile()
+    interval = 1.0 / profile.max_fps if profile.max_fps else 0.0
+    sub = engine.subscribe(profile)
+    try:
+        while True:
+            result = sub.get()
+            if result is None:
+                continue
+            sent = time.monotonic()
+            yield (b"--frame\r\n"
+                   b"Content-Type: image/jpeg\r\n\r\n" + result.jpeg + b"\r\n")
+            delay = interval - (time.monotonic() - sent)
+            if delay > 0:
+                time.sleep(delay)
+    finally:
+        sub.close()
+
+# ----------------- COUNT EVENTS -----------------
+def count_stream(engine, alert=None, alive=None, min_interval=0.1, heartbeat=15.0):
+    # Server-sent events: a full snapshot first, then only the zones whose count changed.
+    # The subscription holds a single update, so a slow client skips straight to the newest
+    # counts, and pushes are coalesced to at most one per min_interval.
+    sub = engine.count_events.subscribe()
+    try:
+        sent = dict(engine.counts)
+        sent_alert = alert(sent) if alert else None
+        sent_flow = engine.crossings.totals()
+        yield "retry: 2000\n\n"
+        yield "data: " + json.dumps({"full": True, "counts": sent, "alert": sent_alert, "flow": sent_flow}) + "\n\n"
+        last_push = last_beat = time.monotonic()
+        while True:
+            update = sub.get(timeout=heartbeat)
+            if time.monotonic() - last_beat >= heartbeat:
+                # Keep-alive comment; also where an expired login ends the stream
+                if alive is not None and not alive():
+                    return
+                yield ": keep-alive\n\n"
+                last_beat = time.monotonic()
+            if update is None:
+                continue
+            wait = min_interval - (time.monotonic() - last_push)
+            if wait > 0:
+                time.sleep(wait)
+                update = sub.get(timeout=0) or update
+            counts = update.counts
+            message = {"frame": update.frame_id, "ts": round(update.timestamp, 3),
+                       "counts": {zone: count for zone, count in counts.items() if sent.get(zone) != count}}
+            removed = [zone for zone in sent if zone not in counts]
+            if removed:
+                message["removed"] = removed
+            current_alert = alert(counts) if alert else None
+            if current_alert != sent_alert:
+                message["alert"] = sent_alert = current_alert
+            if update.flow != sent_flow:
+                # Cumulative entries, exits, dwell and tripwire totals; sent whole, they are small
+                message["flow"] = sent_flow = update.flow
+            if not message["counts"] and not removed and "alert" not in message and "flow" not in message:
+                continue
+            sent = dict(counts)
+            last_push = time.monotonic()
+            yield "data: " + json.dumps(message) + "\n\n"
+    finally:
+        sub.close()
@@ -0,0 +1,93 @@
+import base64, math, os, threading, time
+import cv2
+import numpy as np
+
+# ----------------- CONFIG -----------------
+# Decay windows in seconds, one grid each, e.g. HEATMAP_WINDOWS=300,1800,7200; every window costs one
+# more add per tracked person per frame. The dashboard opens on 10 minutes, or else the shortest window.
+HEATMAP_WINDOWS = tuple(sorted({int(w) for w in os.environ.get("HEATMAP_WINDOWS", "60,600,3600").split(",")
+                                  if w.strip()}))
+DEFAULT_WINDOW = 600 if 600 in HEATMAP_WINDOWS else HEATMAP_WINDOWS[0]
+
+def window_label(seconds):
+    # 60 -> "minute", 600 -> "10 minutes", 90 -> "90 seconds"
+    for unit, size in (("hour", 3600), ("minute", 60)):
+        if seconds % size == 0:
+            count = seconds // size
+            return unit if count == 1 else f"{count} {unit}s"
+    return f"{seconds} seconds"
+
+# ----------------- DENSITY GRID -----------------
+class HeatmapGrid:
+    # Decaying density of track foot points on a coarse grid, one grid per time window.
+    # Decay is applied lazily: new points are added with weight e^((t - t0) / window) and reads scale
+    # by e^(-(t - t0) / window), so a frame only touches the cells its people stand in.
+    def __init__(self, cell=16, windows=HEATMAP_WINDOWS):
+        self.cell = cell
+        self.windows = tuple(windows)
+        self.lock = threading.Lock()
+        self.shape = None
+        self.grids = None
+        self.origin = None
+
+    def _reset(self, shape, now):
+        height, width = shape[:2]
+        self.shape = (height, width)
+        rows, cols = -(-height // self.cell), -(-width // self.cell)
+        self.grids = np.zeros((len(self.windows), rows * cols), dtype=np.float64)
+        self.origin = np.full(len(self.windows), now)
+
+    def add(self, boxes, shape, timestamp=None):
+        now = timestamp or time.time()
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        with self.lock:
+            if self.shape != tuple(shape[:2]):
+                self._reset(shape, now)
+            if not len(boxes):
+                return
+            height, width = self.shape
+            cols = -(-width // self.cell)
+            # Foot point: bottom centre of each box, clipped into the frame
+            x = np.clip((boxes[:, 0] + boxes[:, 2]) // 2, 0, width - 1) // self.cell
+            y = np.clip(boxes[:, 3] - 1, 0, height - 1) // self.cell
+            cells = (y * cols + x).astype(np.intp)
+            for i, window in enumerate(self.windows):
+                exponent = (now - self.origin[i]) / window
+                if exponent > 50:
+                    # Fold the accumulated decay into the grid before the weights overflow
+                    self.grids[i] *= math.exp(-exponent)
+                    self.origin[i] = now
+                    exponent = 0.0
+                np.add.at(self.grids[i], cells, math.exp(exponent))
+
+    def density(self, window, now=None):
+        # (rows, cols) float32 grid: decayed frames-of-presence per cell over roughly the last `window` seconds
+        now = now or time.time()
+        with self.lock:
+            if self.shape is None:
+                return None
+            i = self.windows.index(window)
+            rows, cols = -(-self.shape[0] // self.cell), -(-self.shape[1] // self.cell)
+            grid = self.grids[i] * math.exp(-(now - self.origin[i]) / window)
+        return grid.reshape(rows, cols).astype(np.float32)
+
+    def quantized(self, window):
+        grid = self.density(window)
+        if grid is None:
+            return None
+        peak = float(grid.max())
+        levels = np.zeros(grid.shape, dtype=np.uint8) if peak <= 0 else np.rint(grid * (255 / peak)).astype(np.uint8)
+        return {"window": window, "cell": self.cell, "rows": grid.shape[0], "cols": grid.shape[1],
+                "max": round(peak, 3), "data": base64.b64encode(levels.tobytes()).decode("ascii")}
+
+    def png(self, window):
+        # Colour-mapped grid with density as alpha, one pixel per cell; the browser scales it over the video
+        grid = self.density(window)
+        if grid is None:
+            return None
+        peak = float(grid.max())
+        levels = np.zeros(grid.shape, dtype=np.uint8) if peak <= 0 else np.rint(grid * (255 / peak)).astype(np.uint8)
+        image = cv2.cvtColor(cv2.applyColorMap(levels, cv2.COLORMAP_JET), cv2.COLOR_BGR2BGRA)
+        image[:, :, 3] = levels
+        ok, buffer = cv2.imencode(".png", image)
+        return buffer.tobytes() if ok else None
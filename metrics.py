@@ -0,0 +1,207 @@
+import bisect, os, sys, threading, time
+from contextlib import contextmanager
+
+# ----------------- CONFIG -----------------
+PREFIX = "zone_app_"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# ----------------- METRIC TYPES -----------------
+# Prometheus text exposition without the client library; every update is a dict lookup and
+# an add under one lock, cheap enough for per-frame stage timings.
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def label_text(names, values, extra=""):
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = PREFIX + name, help_text, tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, "", value) for key, value in self.values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self.lock:
+            self.values[key] = value
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = PREFIX + name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}   # labels -> [per-bucket counts (last one is +Inf), sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", key, f'le="{bound}"', cumulative))
+            samples.append((self.name + "_sum", key, "", round(total, 6)))
+            samples.append((self.name + "_count", key, "", cumulative))
+        return samples
+
+# ----------------- REGISTRY -----------------
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []   # called before each scrape to refresh gauges such as queue depths
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def on_collect(self, callback):
+        self.collectors.append(callback)
+
+    def render(self):
+        for callback in self.collectors:
+            callback()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{label_text(metric.labels, key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.add(Histogram(
+    "stage_seconds", "Time spent in each pipeline stage per frame.", ("source", "stage")))
+FRAMES = REGISTRY.add(Counter(
+    "frames_total", "Frames by what happened to them: captured, detected, predicted, held, loading or published.",
+    ("source", "outcome")))
+FRAMES_DROPPED = REGISTRY.add(Counter(
+    "frames_dropped_total", "Stale frames replaced in a bounded queue before anyone took them.", ("source", "queue")))
+DETECTIONS = REGISTRY.add(Counter("detections_total", "People detected.", ("source",)))
+ERRORS = REGISTRY.add(Counter(
+    "errors_total", "Exceptions caught in pipeline threads, which then carry on.", ("worker", "source", "stage")))
+INFERENCE_BATCHES = REGISTRY.add(Counter("inference_batches_total", "Batched detector calls.", ("detector", "model")))
+INFERENCE_CROPS = REGISTRY.add(Counter(
+    "inference_crops_total", "Images sent to the detector; divided by batches gives the mean batch size.",
+    ("detector", "model")))
+ACTIVE_TRACKS = REGISTRY.add(Gauge("active_tracks", "Tracks reported on the latest frame.", ("source",)))
+QUEUE_DEPTH = REGISTRY.add(Gauge("queue_depth", "Items waiting in a pipeline queue.", ("source", "queue")))
+SUBSCRIBERS = REGISTRY.add(Gauge("subscribers", "Connected stream clients.", ("source", "stream")))
+SOURCE_STREAMING = REGISTRY.add(Gauge("source_streaming", "1 while the source is delivering frames.", ("source",)))
+MOTION_ENERGY = REGISTRY.add(Gauge(
+    "zone_motion_energy", "Changed-pixel fraction per zone at the motion gate's latest check.", ("source", "zone")))
+DB_QUERIES = REGISTRY.add(Counter("db_queries_total", "Database statements executed.", ("db", "statement")))
+DB_SECONDS = REGISTRY.add(Histogram("db_query_seconds", "Database statement latency.", ("db",)))
+
+def stage(source, name):
+    return STAGE_SECONDS.time(source=source, stage=name)
+
+@contextmanager
+def db_query(db, sql):
+    DB_QUERIES.inc(db=db, statement=sql.lstrip().split(None, 1)[0].upper())
+    with DB_SECONDS.time(db=db):
+        yield
+
+# ----------------- SAMPLING PROFILER -----------------
+class SamplingProfiler:
+    # Samples every thread's stack at `interval` seconds and counts identical stacks; the output is
+    # the collapsed-stack format flame graph tools read. Off by default, it costs nothing until started.
+    def __init__(self, interval=0.01, max_depth=40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.stacks = {}
+        self.samples = 0
+        self.started = None
+        self.running = False
+        self.thread = None
+
+    def start(self, interval=None):
+        with self.lock:
+            if interval:
+                self.interval = interval
+            if self.running:
+                return
+            self.running = True
+            self.stacks, self.samples, self.started = {}, 0, time.time()
+        self.thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def _loop(self):
+        own = threading.get_ident()
+        while self.running:
+            time.sleep(self.interval)
+            names = {t.ident: t.name for t in threading.enumerate()}
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                calls = []
+                while frame is not None and len(calls) < self.max_depth:
+                    calls.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                sampled.append(";".join([names.get(ident, str(ident))] + calls[::-1]))
+            with self.lock:
+                for stack in sampled:
+                    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    def collapsed(self, limit=200):
+        with self.lock:
+            top = sorted(self.stacks.items(), key=lambda item: -item[1])[:limit]
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+    def status(self):
+        with self.lock:
+            return {"running": self.running, "interval": self.interval, "samples": self.samples,
+                    "stacks": len(self.stacks), "started": self.started}
+
+profiler = SamplingProfiler()
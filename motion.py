@@ -0,0 +1,87 @@
+import time
+import cv2
+import numpy as np
+from zones import zone_points, zone_rects
+
+# ----------------- MOTION GATE -----------------
+class MotionGate:
+    # Frame difference on a small blurred grayscale copy against the frame of the last detection
+    # (check() says whether to detect, detected() records that the detector actually ran).
+    # Motion energy is the fraction of changed pixels inside each zone (grown by a margin);
+    # while every zone stays below min_energy the detector is skipped and the tracks are held.
+    def __init__(self, zones, width=160, pixel_threshold=25, min_energy=0.002, margin=0.05, max_hold=10.0):
+        self.zones = zones
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_energy = min_energy
+        self.margin = margin
+        self.max_hold = max_hold
+        self.key = None
+        self.names = []
+        self.masks = None
+        self.areas = None
+        self.reference = None
+        self.pending = None   # the last frame that should be detected, until detected() confirms it was
+        self.last_detection = 0.0
+        self.energy = {}
+        self.moving = True
+        self.held_frames = 0
+
+    def _build(self, zones, shape, small):
+        # (Z, h, w) zone masks at the small resolution; no zones watches the whole frame
+        height, width = small
+        scale = width / shape[1]
+        self.names = [z['zone_name'] for z in zones]
+        masks = np.zeros((max(len(zones), 1), height, width), dtype=np.uint8)
+        if not zones:
+            masks[0] = 1
+        for mask, zone, rect in zip(masks, zones, zone_rects(zones)):
+            points = zone_points(zone)
+            if points:
+                cv2.fillPoly(mask, [np.rint(np.asarray(points) * scale).astype(np.int32).reshape(-1, 1, 2)], 1)
+            else:
+                x1, y1, x2, y2 = np.rint(rect * scale).astype(int)
+                mask[y1:y2 + 1, x1:x2 + 1] = 1
+        pad = int(round(self.margin * height))
+        if pad:
+            kernel = np.ones((2 * pad + 1, 2 * pad + 1), dtype=np.uint8)
+            masks = np.stack([cv2.dilate(mask, kernel) for mask in masks])
+        self.masks = masks.astype(bool)
+        self.areas = np.maximum(self.masks.sum(axis=(1, 2)), 1)
+
+    def check(self, frame):
+        # True when the detector should run on this frame
+        height = max(1, int(round(frame.shape[0] * self.width / frame.shape[1])))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        zones = self.zones()
+        if self.key is None or self.key[0] is not zones or self.key[1] != frame.shape[:2]:
+            self._build(zones, frame.shape, (height, self.width))
+            self.key = (zones, frame.shape[:2])
+            self.reference = self.pending = None
+
+        now = time.monotonic()
+        if self.reference is None:
+            self.moving = True
+        else:
+            changed = cv2.absdiff(gray, self.reference) > self.pixel_threshold
+            energy = (self.masks & changed).sum(axis=(1, 2)) / self.areas
+            self.energy = dict(zip(self.names, np.round(energy, 4).tolist()))
+            # Still re-detect every max_hold seconds so slow drift cannot go unnoticed forever
+            self.moving = bool(energy.max() >= self.min_energy) or now - self.last_detection >= self.max_hold
+        if self.moving:
+            self.pending = gray
+        else:
+            self.held_frames += 1
+        return self.moving
+
+    def detected(self):
+        # The detector ran on the frame of the last check that returned True; only now does it
+        # become the reference, so a frame that waited for a model load or failed to detect does not
+        if self.pending is not None:
+            self.reference, self.pending = self.pending, None
+        self.last_detection = time.monotonic()
+
+    def status(self):
+        return {"moving": self.moving, "energy": self.energy, "held_frames": self.held_frames}
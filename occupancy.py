@@ -0,0 +1,174 @@
+import os, sqlite3, threading, time
+from metrics import db_query
+
+# ----------------- CONFIG -----------------
+OCCUPANCY_PATH = os.environ.get("OCCUPANCY_DB", "occupancy.db")
+RESOLUTIONS = (1, 60, 3600)   # seconds per rollup bucket
+RETENTION = {1: 2 * 86400, 60: 90 * 86400, 3600: None}   # seconds kept per resolution; None keeps everything
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_{res} (
+    source TEXT NOT NULL,
+    zone TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    avg REAL NOT NULL,
+    max INTEGER NOT NULL,
+    p95 REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (source, zone, ts)
+) WITHOUT ROWID;
+"""
+
+# ----------------- ROLLUPS -----------------
+def summarize(histogram):
+    # Counts are small integers, so an open bucket is a value -> frames histogram;
+    # avg, max and an exact p95 come straight from it without keeping raw samples
+    values = sorted(histogram)
+    samples = sum(histogram.values())
+    rank, seen, p95 = 0.95 * samples, 0, values[-1]
+    for value in values:
+        seen += histogram[value]
+        if seen >= rank:
+            p95 = value
+            break
+    return sum(v * n for v, n in histogram.items()) / samples, values[-1], float(p95), samples
+
+class OccupancyStore:
+    # Frame loops call record(); a writer thread closes finished buckets and writes them in one batch
+    def __init__(self, path=OCCUPANCY_PATH, flush_interval=1.0, max_points=1500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_points = max_points
+        self.lock = threading.Lock()
+        self.buckets = {}   # (resolution, bucket start, source, zone) -> {count: frames}
+        self.read_lock = threading.Lock()
+        self.reader = self._connect()
+        self.running = False
+        self.restart = False   # forked child of a running store: start the writer on the first record()
+        self.thread = None
+        self.last_prune = 0.0
+        # A worker forked from a preloaded app (gunicorn --preload) inherits neither the writer thread
+        # nor a usable SQLite connection
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Only processes that go on to record or query get a writer thread or a connection back;
+        # forked helpers that never touch the store stay without either
+        self.lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.buckets = {}
+        self.reader = None
+        self.restart = self.running
+        self.running, self.thread = False, None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for res in RESOLUTIONS:
+            conn.execute(SCHEMA.format(res=res))
+        return conn
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="occupancy-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def record(self, source, counts, timestamp=None):
+        timestamp = int(timestamp or time.time())
+        with self.lock:
+            if self.restart:
+                self.restart = False
+                self.start()
+            for res in RESOLUTIONS:
+                start = timestamp - timestamp % res
+                for zone, count in counts.items():
+                    histogram = self.buckets.setdefault((res, start, source, zone), {})
+                    histogram[count] = histogram.get(count, 0) + 1
+
+    def _loop(self):
+        writer = self._connect()
+        try:
+            while self.running:
+                time.sleep(self.flush_interval)
+                self.flush(writer)
+            self.flush(writer, everything=True)
+        finally:
+            writer.close()
+
+    def flush(self, conn, now=None, everything=False):
+        now = now or time.time()
+        with self.lock:
+            closed = [key for key in self.buckets if everything or key[1] + key[0] <= now]
+            finished = [(key, self.buckets.pop(key)) for key in closed]
+        if not finished:
+            return 0
+        rows = {res: [] for res in RESOLUTIONS}
+        for (res, start, source, zone), histogram in finished:
+            rows[res].append((source, zone, start) + summarize(histogram))
+        with conn, db_query("occupancy", "INSERT"):
+            for res, batch in rows.items():
+                if batch:
+                    # A bucket flushed early (shutdown) merges with the rest of it written after a restart;
+                    # the merged p95 is the larger of the two, an upper bound
+                    conn.executemany(
+                        f"INSERT INTO rollup_{res} VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (source, zone, ts) DO UPDATE SET "
+                        "avg = (avg * samples + excluded.avg * excluded.samples) / (samples + excluded.samples), "
+                        "max = MAX(max, excluded.max), p95 = MAX(p95, excluded.p95), "
+                        "samples = samples + excluded.samples",
+                        batch
+                    )
+            if now - self.last_prune > 3600:
+                for res, keep in RETENTION.items():
+                    if keep:
+                        conn.execute(f"DELETE FROM rollup_{res} WHERE ts < ?", (int(now - keep),))
+                self.last_prune = now
+        return len(finished)
+
+    def pick_resolution(self, start, end):
+        # Finest rollup that still returns at most max_points buckets per zone
+        for res in RESOLUTIONS:
+            if (end - start) / res <= self.max_points:
+                return res
+        return RESOLUTIONS[-1]
+
+    def query(self, source, start, end, zone=None, resolution=None):
+        res = resolution if resolution in RESOLUTIONS else self.pick_resolution(start, end)
+        sql = f"SELECT zone, ts, avg, max, p95, samples FROM rollup_{res} WHERE source=? AND ts BETWEEN ? AND ?"
+        params = [source, int(start), int(end)]
+        if zone:
+            sql = (f"SELECT zone, ts, avg, max, p95, samples FROM rollup_{res} "
+                   "WHERE source=? AND zone=? AND ts BETWEEN ? AND ?")
+            params.insert(1, zone)
+        # Buckets still open in memory (the current second, minute and hour) are part of the answer too.
+        # Taken before the read, so a bucket the writer flushes in between shows up on both sides.
+        with self.lock:
+            pending = {(key[3], key[1]): dict(histogram) for key, histogram in self.buckets.items()
+                       if key[0] == res and key[2] == source and int(start) <= key[1] <= int(end)
+                       and (not zone or key[3] == zone)}
+        with self.read_lock, db_query("occupancy", sql):
+            if self.reader is None:
+                self.reader = self._connect()
+            rows = self.reader.execute(sql, params).fetchall()
+        buckets = {(name, ts): (avg, peak, p95, samples) for name, ts, avg, peak, p95, samples in rows}
+        for key, histogram in pending.items():
+            avg, peak, p95, samples = summarize(histogram)
+            if key in buckets:
+                # Merged the same way flush() merges a bucket written in two parts
+                old_avg, old_peak, old_p95, old_samples = buckets[key]
+                avg = (old_avg * old_samples + avg * samples) / (old_samples + samples)
+                peak, p95, samples = max(old_peak, peak), max(old_p95, p95), old_samples + samples
+            buckets[key] = (avg, peak, p95, samples)
+        series = {}
+        for (name, ts), (avg, peak, p95, _) in sorted(buckets.items()):
+            series.setdefault(name, []).append([ts, round(avg, 3), peak, p95])
+        return {"source": source, "resolution": res, "start": int(start), "end": int(end), "series": series}
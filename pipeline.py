@@ -0,0 +1,345 @@
+import logging, queue, threading, time
+import cv2
+from metrics import (DETECTIONS, ERRORS, FRAMES, FRAMES_DROPPED, INFERENCE_BATCHES, INFERENCE_CROPS, STAGE_SECONDS,
+                     stage)
+from roi import merge_detections
+from sources import describe_uri, is_live, open_capture
+
+# Passed to analyze instead of detections when the motion gate saw no change: hold every track in place
+HOLD = "hold"
+
+# Capture health states, reported by CaptureWorker.status()
+IDLE, CONNECTING, STREAMING, RECONNECTING, ENDED, FAILED = (
+    "idle", "connecting", "streaming", "reconnecting", "ended", "failed")
+# What a recorded file does when it runs out: rewind, stop, or play the next queued file
+EOF_POLICIES = ("loop", "stop", "next")
+
+log = logging.getLogger(__name__)
+
+# ----------------- QUEUE HELPERS -----------------
+def put_latest(q, item):
+    # Bounded queues only ever hold the freshest item: drop stale frames instead of blocking.
+    # Returns how many stale items were dropped.
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+# ----------------- WORKER THREADS -----------------
+class Worker:
+    def __init__(self, name):
+        self.name = name
+        self.running = False
+        self.thread = None
+        self.errors = 0
+        self.last_error = None   # (unix time, message) of the latest caught exception
+
+    def start(self):
+        if self.running and self.thread is not None and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.thread = None
+
+    def _loop(self):
+        # One failing step must not take the thread, and every source it serves, down with it
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.failed(e, "loop")
+                time.sleep(0.1)
+
+    def failed(self, error, step, source=""):
+        log.exception("%s: %s failed%s", self.name, step, f" for {source}" if source else "")
+        ERRORS.inc(worker=self.name, source=source, stage=step)
+        self.errors += 1
+        self.last_error = (time.time(), f"{step}: {error!r}")
+
+    def run_once(self):
+        raise NotImplementedError
+
+    def health(self):
+        return {
+            "alive": self.thread is not None and self.thread.is_alive(),
+            "errors": self.errors,
+            "last_error": self.last_error[1] if self.last_error else None,
+            "last_error_at": round(self.last_error[0], 3) if self.last_error else None,
+        }
+
+class CaptureWorker(Worker):
+    # Opens, reads and reopens one source on its own thread. Whenever there is nothing to read
+    # (no source, ended, failed or waiting to reconnect) it blocks on an event instead of polling.
+    # Live sources reconnect with exponential backoff; recorded files follow their end-of-file policy.
+    def __init__(self, name, frames, on_frame=None, min_backoff=0.5, max_backoff=30.0):
+        super().__init__(f"capture-{name}")
+        self.source_name = name
+        self.frames = frames
+        self.on_frame = on_frame
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.uri = None
+        self.on_eof = "loop"
+        self.playlist = []
+        self.capture = None
+        self.capture_fps = 0
+        self.live = False
+        self.frames_read = 0   # since the capture was opened or rewound
+        self.state = IDLE
+        self.since = time.time()
+        self.error = None
+        self.failures = 0
+        self.reconnects = 0
+        self.retry_at = None
+        self.next_due = time.monotonic()
+
+    def set_source(self, uri, on_eof="loop", playlist=()):
+        # Only records the request; the capture thread does the (possibly slow) open
+        if on_eof not in EOF_POLICIES:
+            raise ValueError(f"unknown end-of-file policy {on_eof}")
+        with self.lock:
+            self.uri, self.on_eof, self.playlist = uri, on_eof, list(playlist)
+            self.reconnects = 0
+        self.changed.set()
+
+    def stop(self):
+        self.running = False
+        self.changed.set()
+        super().stop()
+        self._close()
+        self._set_state(IDLE)
+
+    def _set_state(self, state, error=None):
+        with self.lock:
+            if state != self.state:
+                self.since = time.time()
+            self.state, self.error = state, error
+
+    def _close(self):
+        if self.capture is not None:
+            self.capture.release()
+        self.capture = None
+        self.retry_at = None
+
+    def _open(self):
+        with self.lock:
+            uri = self.uri
+        if uri is None:
+            self._set_state(IDLE)
+            return
+        capture, fps = open_capture(uri)
+        if not capture.isOpened():
+            capture.release()
+            self._fail(f"cannot open {uri}")
+            return
+        self.capture, self.capture_fps, self.live = capture, fps, is_live(uri)
+        self.frames_read, self.failures, self.retry_at = 0, 0, None
+        self.next_due = time.monotonic()
+        self._set_state(STREAMING)
+
+    def _fail(self, error):
+        self._close()
+        with self.lock:
+            live = is_live(self.uri)
+        if not live:
+            self._set_state(FAILED, error)
+            return
+        # 0.5 s, 1 s, 2 s ... capped at max_backoff; a new source cuts the wait short
+        delay = min(self.max_backoff, self.min_backoff * 2 ** self.failures)
+        self.failures += 1
+        self.retry_at = time.monotonic() + delay
+        self._set_state(RECONNECTING, error)
+
+    def _end_of_file(self):
+        with self.lock:
+            on_eof, playlist = self.on_eof, self.playlist
+        if self.frames_read == 0:
+            # Nothing readable since opening or rewinding: a broken file, not an ending
+            self._fail(f"cannot read {self.uri}")
+        elif on_eof == "loop":
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.frames_read = 0
+        elif on_eof == "next" and playlist:
+            self._close()
+            with self.lock:
+                self.uri = playlist.pop(0)
+            self._open()
+        else:
+            self._close()
+            self._set_state(ENDED)
+
+    def run_once(self):
+        if self.changed.is_set():
+            self.changed.clear()
+            self._close()
+            if not self.running:
+                return
+            self.failures = 0
+            self._set_state(CONNECTING)
+            self._open()
+        if self.capture is None:
+            timeout = None if self.retry_at is None else max(0.0, self.retry_at - time.monotonic())
+            if not self.changed.wait(timeout) and self.running:
+                with self.lock:
+                    self.reconnects += 1
+                self._open()
+            return
+        with stage(self.source_name, "capture"):
+            success, frame = self.capture.read()
+        if not success:
+            if self.live:
+                self._fail("stream lost")
+            else:
+                self._end_of_file()
+            return
+        self.frames_read += 1
+        FRAMES.inc(source=self.source_name, outcome="captured")
+        if put_latest(self.frames, frame):
+            FRAMES_DROPPED.inc(source=self.source_name, queue="raw")
+        if self.on_frame:
+            self.on_frame()
+        if self.capture_fps > 0:
+            # Pace recorded sources at their native rate; live sources block in read()
+            self.next_due = max(self.next_due + 1.0 / self.capture_fps, time.monotonic() - 1.0)
+            delay = self.next_due - time.monotonic()
+            if delay > 0:
+                self.changed.wait(delay)
+
+    def status(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "since": round(self.since, 3),
+                "error": self.error,
+                "uri": self.uri,
+                "kind": describe_uri(self.uri) if self.uri else None,
+                "on_eof": self.on_eof,
+                "queued": len(self.playlist),
+                "reconnects": self.reconnects,
+                "retry_in": round(max(0.0, self.retry_at - time.monotonic()), 1) if self.retry_at else None,
+            }
+
+class EncoderWorker(Worker):
+    # Hands processed frames to the engine, which resizes and encodes only the stream variants being watched
+    def __init__(self, name, frames, publish):
+        super().__init__(f"encoder-{name}")
+        self.frames = frames
+        self.publish = publish
+
+    def run_once(self):
+        try:
+            frame, counts = self.frames.get(timeout=0.5)
+        except queue.Empty:
+            return
+        self.publish(frame, counts)
+
+class BatchInferenceWorker(Worker):
+    def __init__(self, detect_batch, sources, max_wait=0.01, ready=None):
+        super().__init__("inference")
+        self.detect_batch = detect_batch
+        self.sources = sources
+        self.ready = ready   # ready(detector, model): False while that model is still loading or warming up
+        self.max_wait = max_wait
+        self.frames_ready = threading.Event()
+        self.source_errors = {}   # source name -> (unix time, message) of its latest analyze failure
+
+    def notify(self):
+        self.frames_ready.set()
+
+    def run_once(self):
+        if not self.frames_ready.wait(timeout=0.5):
+            return
+        self.frames_ready.clear()
+        # Give the other live sources a few ms to deliver so they share this batch
+        sources = self.sources()
+        deadline = time.monotonic() + self.max_wait
+        while time.monotonic() < deadline and any(
+                s.raw_frames.empty() for s in sources if s.capture_worker.state == STREAMING):
+            time.sleep(0.001)
+
+        # Take the newest pending frame from every source and detect them in one call per detector and model;
+        # sources between scheduled detections go straight to their tracker's prediction
+        # and sources whose zones show no motion since their last detection hold their tracks,
+        # as do sources whose model is not loaded yet, so a load never stalls the other sources
+        batches, skipped, held, waiting = {}, [], [], []
+        for source in sources:
+            try:
+                frame = source.raw_frames.get_nowait()
+            except queue.Empty:
+                continue
+            if not source.cadence.should_detect():
+                skipped.append((source, frame))
+                continue
+            if self.ready is not None and not self.ready(source.detector, source.model):
+                waiting.append((source, frame))
+                continue
+            if source.motion is not None:
+                with stage(source.name, "motion"):
+                    still = not source.motion.check(frame)
+                if still:
+                    held.append((source, frame))
+                    continue
+            batches.setdefault((source.detector, source.model), []).append((source, frame))
+        for (detector, model), batch in batches.items():
+            # Each frame contributes its detection windows (the whole frame, a zone crop or tiles);
+            # detections come back per window and are shifted into frame coordinates
+            crops, owners = [], []
+            for i, (source, frame) in enumerate(batch):
+                for x1, y1, x2, y2 in source.windows(frame.shape):
+                    crops.append(frame[y1:y2, x1:x2])
+                    owners.append((i, x1, y1))
+            parts = [[] for _ in batch]
+            started = time.perf_counter()
+            try:
+                results = self.detect_batch(crops, model, detector)
+            except Exception as e:
+                # The frames still reach their trackers, as predictions, so the sources keep moving
+                self.failed(e, "detect")
+                skipped.extend(batch)
+                continue
+            elapsed = time.perf_counter() - started
+            labels = {"detector": detector or "default", "model": model or "default"}
+            INFERENCE_BATCHES.inc(**labels)
+            INFERENCE_CROPS.inc(len(crops), **labels)
+            for (i, x, y), detections in zip(owners, results):
+                parts[i].append((x, y, detections))
+            for (source, frame), frame_parts in zip(batch, parts):
+                # Every frame in the batch waited for the whole call
+                STAGE_SECONDS.observe(elapsed, source=source.name, stage="detect")
+                detections = merge_detections(frame_parts)
+                FRAMES.inc(source=source.name, outcome="detected")
+                if source.motion is not None:
+                    source.motion.detected()
+                DETECTIONS.inc(len(detections), source=source.name)
+                self._process(source, frame, detections)
+        for source, frame in skipped:
+            FRAMES.inc(source=source.name, outcome="predicted")
+            self._process(source, frame, None)
+        for source, frame in held:
+            FRAMES.inc(source=source.name, outcome="held")
+            self._process(source, frame, HOLD)
+        for source, frame in waiting:
+            FRAMES.inc(source=source.name, outcome="loading")
+            self._process(source, frame, HOLD)
+
+    def _process(self, source, frame, detections):
+        try:
+            source.process(frame, detections)
+        except Exception as e:
+            self.failed(e, "analyze", source.name)
+            self.source_errors[source.name] = self.last_error
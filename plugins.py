@@ -0,0 +1,183 @@
+import threading
+import cv2
+import numpy as np
+from tracking import AssignmentTracker, ByteTracker, CentroidTracker, deepsort_detections
+
+# ----------------- TRACKER PLUGINS -----------------
+# Every tracker plugin takes the detector's (N, 5) x1, y1, x2, y2, confidence array plus the frame,
+# and returns track records; each adapts that to what its tracker consumes.
+def xywh(detections):
+    xyxy = detections[:, :4].astype(int)
+    return np.hstack([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]])
+
+class RectTracking:
+    # Trackers fed plain (x, y, w, h) boxes above a confidence threshold
+    def __init__(self, name, tracker, min_conf=0.3, max_missing=None):
+        self.name = name
+        self.tracker = tracker
+        self.min_conf = min_conf
+        # Frames an unmatched track survives before the tracker drops its ID
+        self.max_missing = max_missing if max_missing is not None else getattr(tracker, "maxDisappeared", 40)
+
+    def update(self, detections, frame=None):
+        kept = detections[detections[:, 4] >= self.min_conf]
+        return self.tracker.update([tuple(rect) for rect in xywh(kept).tolist()])
+
+    def predict(self):
+        return self.tracker.predict()
+
+    def hold(self):
+        return self.tracker.hold()
+
+    def status(self):
+        extra = self.tracker.status() if hasattr(self.tracker, "status") else {}
+        return dict(extra, name=self.name)
+
+class ScoredTracking(RectTracking):
+    # Confidence is part of the association (ByteTrack keeps low-score boxes for a second pass)
+    def update(self, detections, frame=None):
+        return self.tracker.update(detections[detections[:, 4] >= self.min_conf])
+
+class ReIDTracking(RectTracking):
+    # Appearance re-identification needs the frame to crop people from
+    def update(self, detections, frame=None):
+        return self.tracker.update(deepsort_detections(detections, self.min_conf), frame=frame)
+
+def deepsort_tracking(config):
+    # deep_sort_realtime pulls in torch for its re-ID model; only imported when a source uses it
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+    from tracking import DeepSortTracker
+    # REID_EMBEDDER None leaves the re-ID model to be set by the caller (the benchmark's histogram one)
+    deepsort = DeepSort(max_age=30, nn_budget=config["REID_BUDGET"], embedder=config.get("REID_EMBEDDER", "mobilenet"))
+    tracker = DeepSortTracker(deepsort, reuse_iou=config["REID_IOU"], refresh=config["REID_REFRESH"])
+    return ReIDTracking("deepsort", tracker, min_conf=0.35, max_missing=deepsort.tracker.max_age)
+
+TRACKER_PLUGINS = {
+    "centroid": lambda config: RectTracking("centroid", CentroidTracker()),
+    "assignment": lambda config: RectTracking("assignment", AssignmentTracker()),
+    "bytetrack": lambda config: ScoredTracking("bytetrack", ByteTracker(), min_conf=0.1),
+    "deepsort": deepsort_tracking,
+}
+
+def make_tracker(name, config):
+    if name not in TRACKER_PLUGINS:
+        raise ValueError(f"unknown tracker {name!r}, expected one of {sorted(TRACKER_PLUGINS)}")
+    return TRACKER_PLUGINS[name](config)
+
+# ----------------- DETECTOR PLUGINS -----------------
+# detect(frames, model) -> one (N, 5) x1, y1, x2, y2, confidence float32 array per frame.
+# The threshold is low enough for every tracker plugin; each filters to its own.
+DETECT_CONF = 0.1
+
+class YoloDetection:
+    def __init__(self, config):
+        # ultralytics (and torch) load with the first model, not at import
+        from detectors import DetectorRegistry
+        self.registry = DetectorRegistry(device=config.get("DETECTOR_DEVICE"))
+
+    def detect(self, frames, model=None):
+        return self.registry.detect(frames, model, classes=[0], conf=DETECT_CONF)
+
+    def load(self, model=None):
+        self.registry.preload(model)
+
+    def warmup(self, model=None):
+        self.registry.warmup(model)
+
+    def status(self):
+        return self.registry.status()
+
+class HogDetection:
+    # OpenCV's HOG + linear SVM people detector: CPU only and no weights to download, but far less
+    # accurate than YOLO and blind to small or partly hidden people. The model size is ignored.
+    def __init__(self, config):
+        if not hasattr(cv2, "HOGDescriptor"):
+            # OpenCV 5 moved HOG to the contrib modules
+            raise ImportError("this OpenCV build has no HOGDescriptor")
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, frames, model=None):
+        results = []
+        for frame in frames:
+            rects, weights = self.hog.detectMultiScale(frame, winStride=(8, 8), padding=(8, 8), scale=1.05)
+            rects = np.asarray(rects, dtype=np.float32).reshape(-1, 4)
+            # SVM margins rather than probabilities; clipped into the same 0..1 range
+            conf = np.clip(np.asarray(weights, dtype=np.float32).reshape(-1), 0, 1)
+            results.append(np.hstack([rects[:, :2], rects[:, :2] + rects[:, 2:], conf[:, None]]))
+        return results
+
+    def load(self, model=None):
+        pass
+
+    def warmup(self, model=None):
+        self.detect([np.zeros((128, 64, 3), dtype=np.uint8)])
+
+    def status(self):
+        return {"detector": "hog"}
+
+DETECTOR_PLUGINS = {"yolo": YoloDetection, "hog": HogDetection}
+
+class DetectorSet:
+    # Detector plugins are created on first use, so only the detectors some source uses are loaded
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.loaded = {}
+        self.warmups = {}   # (detector, model) -> "loading", "ready" or "failed: <error>"
+
+    def get(self, name):
+        if name not in DETECTOR_PLUGINS:
+            raise ValueError(f"unknown detector {name!r}, expected one of {sorted(DETECTOR_PLUGINS)}")
+        with self.lock:
+            if name not in self.loaded:
+                self.loaded[name] = DETECTOR_PLUGINS[name](self.config)
+            return self.loaded[name]
+
+    def detect(self, frames, model=None, detector=None):
+        return self.get(detector or self.config["DETECTOR"]).detect(frames, model)
+
+    def preload(self, name=None, model=None):
+        # Load (exporting if needed) and, for torch, fuse the layers, but run no inference: backend
+        # thread pools started before a fork (gunicorn --preload) do not survive it. Fused torch
+        # weights are then left untouched by the first predict, so forked workers keep sharing them.
+        self.get(name or self.config["DETECTOR"]).load(model)
+
+    def prepare(self, name=None, model=None):
+        # Load and warm up a detector in the background, once, when a source first needs it
+        key = (name or self.config["DETECTOR"], model)
+        with self.lock:
+            if key in self.warmups and not self.warmups[key].startswith("failed"):
+                return
+            self.warmups[key] = "loading"
+        threading.Thread(target=self._prepare, args=key, name=f"warmup-{key[0]}-{model or 'default'}",
+                         daemon=True).start()
+
+    def _prepare(self, name, model):
+        try:
+            self.get(name).warmup(model)
+            state = "ready"
+        except Exception as e:
+            state = f"failed: {e}"
+        with self.lock:
+            self.warmups[(name, model)] = state
+
+    def is_ready(self, name=None, model=None):
+        # Whether frames for this detector and model can be detected without waiting for a load.
+        # A combination nobody prepared yet starts preparing now; a failed one waits for the next request.
+        key = (name or self.config["DETECTOR"], model)
+        with self.lock:
+            state = self.warmups.get(key)
+        if state is None:
+            self.prepare(*key)
+        return state == "ready"
+
+    def readiness(self):
+        # Ready once every detector a source asked for is loaded and warm
+        with self.lock:
+            states = {f"{name}/{model or 'default'}": state for (name, model), state in self.warmups.items()}
+        return all(state == "ready" for state in states.values()), states
+
+    def status(self):
+        with self.lock:
+            return {name: plugin.status() for name, plugin in self.loaded.items()}
@@ -0,0 +1,79 @@
+import numpy as np
+from zones import zone_rects
+
+# ----------------- REGION OF INTEREST -----------------
+def zone_union(zones, shape, margin=0.1, min_saving=0.1):
+    # Bounding box of every zone, padded by margin * frame height so people standing on a zone
+    # edge are still fully visible; None when there are no zones or cropping would barely help
+    if not zones:
+        return None
+    height, width = shape[:2]
+    rects = zone_rects(zones)
+    pad = margin * height
+    x1, y1 = np.maximum(rects[:, :2].min(axis=0) - pad, 0).astype(int)
+    x2, y2 = np.minimum(rects[:, 2:].max(axis=0) + pad, (width, height)).astype(int)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    if (x2 - x1) * (y2 - y1) > (1 - min_saving) * width * height:
+        return None
+    return int(x1), int(y1), int(x2), int(y2)
+
+def spans(start, stop, size, overlap):
+    # Evenly spaced windows of the given size covering [start, stop), neighbours overlapping
+    if stop - start <= size:
+        return [(start, stop)]
+    count = int(np.ceil((stop - start - size) / (size * (1 - overlap)))) + 1
+    return [(int(o), int(o) + size) for o in np.linspace(start, stop - size, count)]
+
+def tile_windows(region, tile_size, overlap=0.2):
+    x1, y1, x2, y2 = region
+    return [(a, b, c, d) for b, d in spans(y1, y2, tile_size, overlap)
+            for a, c in spans(x1, x2, tile_size, overlap)]
+
+class RegionCropper:
+    # Detection windows for one source, recomputed only when its zones or the frame size change
+    def __init__(self, zones, margin=0.1, tile_size=0, overlap=0.2):
+        self.zones = zones
+        self.margin = margin
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.key = None
+        self.cached = None
+
+    def windows(self, shape):
+        zones = self.zones()
+        if self.key is None or self.key[0] is not zones or self.key[1] != shape[:2]:
+            height, width = shape[:2]
+            region = zone_union(zones, shape, self.margin) or (0, 0, width, height)
+            if self.tile_size and max(region[2] - region[0], region[3] - region[1]) > self.tile_size:
+                self.cached = tile_windows(region, self.tile_size, self.overlap)
+            else:
+                self.cached = [region]
+            self.key = (zones, shape[:2])
+        return self.cached
+
+# ----------------- MERGING -----------------
+def suppress_duplicates(detections, threshold=0.6):
+    # Greedy NMS on intersection over the smaller box: a person cut in half by a tile edge
+    # overlaps the full detection from the neighbouring tile mostly by the smaller box's area
+    order = np.argsort(-detections[:, 4])
+    boxes = detections[order, :4]
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    top_left = np.maximum(boxes[:, None, :2], boxes[None, :, :2])
+    bottom_right = np.minimum(boxes[:, None, 2:], boxes[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    overlap = inter / np.maximum(np.minimum(areas[:, None], areas[None, :]), 1e-6)
+    keep = np.ones(len(boxes), dtype=bool)
+    for i in range(len(boxes)):
+        if keep[i]:
+            keep[i + 1:] &= overlap[i, i + 1:] < threshold
+    return detections[order[keep]]
+
+def merge_detections(parts):
+    # parts: [(x, y, detections (N, 5) x1, y1, x2, y2, conf)] from the windows of one frame
+    shifted = [d + np.array([x, y, x, y, 0], dtype=d.dtype) for x, y, d in parts if len(d)]
+    if not shifted:
+        return np.zeros((0, 5), dtype=np.float32)
+    if len(parts) == 1:
+        return shifted[0]
+    return suppress_duplicates(np.vstack(shifted))
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+# ----------------- TEST PATTERN -----------------
+class TestPatternCapture:
+    # Drop-in stand-in for cv2.VideoCapture: figures walking across a static background
+    def __init__(self, width=640, height=360, fps=15, people=8, seed=0):
+        self.width, self.height, self.fps = width, height, fps
+        rng = np.random.default_rng(seed)
+        self.positions = rng.uniform((0, 0), (width, height), size=(people, 2))
+        self.velocities = rng.uniform(-4, 4, size=(people, 2))
+        self.background = np.full((height, width, 3), 90, dtype=np.uint8)
+        cv2.rectangle(self.background, (0, height * 2 // 3), (width, height), (60, 60, 60), -1)
+        self.frame_index = 0
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        self.positions += self.velocities
+        bounds = np.array([self.width, self.height], dtype=float)
+        bounce = (self.positions < 0) | (self.positions > bounds)
+        self.velocities[bounce] *= -1
+        self.positions = np.clip(self.positions, 0, bounds)
+        frame = self.background.copy()
+        for x, y in self.positions.astype(int):
+            cv2.rectangle(frame, (x - 10, y - 30), (x + 10, y + 30), (30, 30, 200), -1)
+            cv2.circle(frame, (x, y - 40), 10, (150, 180, 220), -1)
+        self.frame_index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_index)
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.frame_index = int(value)
+            return True
+        return False
+
+    def release(self):
+        self.opened = False
+
+# ----------------- SOURCE URIS -----------------
+def open_capture(uri):
+    # Returns (capture, fps); fps is only set for recorded sources so playback is paced at native speed
+    if uri == "test" or uri.startswith("test://"):
+        capture = TestPatternCapture()
+        return capture, capture.fps
+    if uri == "webcam":
+        return cv2.VideoCapture(0), 0
+    if uri.isdigit():
+        return cv2.VideoCapture(int(uri)), 0
+    if "://" in uri:
+        return cv2.VideoCapture(uri), 0
+    capture = cv2.VideoCapture(uri)
+    return capture, capture.get(cv2.CAP_PROP_FPS)
+
+def describe_uri(uri):
+    if uri == "test" or uri.startswith("test://"):
+        return "test"
+    if uri == "webcam" or uri.isdigit():
+        return "webcam"
+    if "://" in uri:
+        return "stream"
+    return "file"
+
+def is_live(uri):
+    # Webcams and network streams reconnect when they drop; files and the test pattern do not
+    return uri is not None and describe_uri(uri) in ("webcam", "stream")
@@ -26,6 +26,9 @@ async function uploadVideo() {
 async function useWebcam() {
     const formData = new FormData();
     formData.append("source", "webcam");
+    formData.append("model", document.getElementById("modelSize").value);
+    formData.append("tracker", document.getElementById("trackerPlugin").value);
+    formData.append("detector", document.getElementById("detectorPlugin").value);
     const res = await fetch("/set_source", { method: "POST", body: formData });
     const data = await res.json();
     alert(data.status || data.error);
@@ -39,7 +42,7 @@ function startDraw() {
     let canvas = document.getElementById("canvas");
 
     // Force reload the stream if hidden before
-    video.src = "/video_feed?" + new Date().getTime();
+    video.src = "/video_feed?profile=low&t=" + new Date().getTime();
     video.style.display = "block";
     canvas.style.display = "block";
 
@@ -58,9 +61,7 @@ function startDraw() {
             ctx.clearRect(0, 0, canvas.width, canvas.height);
             endX = e.offsetX;
             endY = e.offsetY;
-            ctx.strokeStyle = 'red';
-            ctx.lineWidth = 2;
-            ctx.strokeRect(startX, startY, endX - startX, endY - startY);
+            strokeShape(ctx);
         }
     };
 
@@ -70,12 +71,24 @@ function startDraw() {
         endY = e.offsetY;
 
         ctx.clearRect(0, 0, canvas.width, canvas.height);
-        ctx.strokeStyle = 'red';
-        ctx.lineWidth = 2;
-        ctx.strokeRect(startX, startY, endX - startX, endY - startY);
+        strokeShape(ctx);
     };
 }
 
+// A tripwire is drawn as a line from where the drag started to where it ended
+function strokeShape(ctx) {
+    ctx.strokeStyle = 'red';
+    ctx.lineWidth = 2;
+    if (document.getElementById('zoneTripwire').checked) {
+        ctx.beginPath();
+        ctx.moveTo(startX, startY);
+        ctx.lineTo(endX, endY);
+        ctx.stroke();
+    } else {
+        ctx.strokeRect(startX, startY, endX - startX, endY - startY);
+    }
+}
+
 // ================================
 // SAVE ZONE
 // ================================
@@ -91,6 +104,10 @@ function saveZone() {
         topleft: { x: Math.min(startX, endX), y: Math.min(startY, endY) },
         bottomright: { x: Math.max(startX, endX), y: Math.max(startY, endY) }
     };
+    if (document.getElementById('zoneTripwire').checked) {
+        // Two points make a tripwire; "in" counts crossings from its left to its right, facing start to end
+        zone.points = [{ x: startX, y: startY }, { x: endX, y: endY }];
+    }
 
     fetch('/save_zone', {
         method: 'POST',
@@ -154,9 +171,23 @@ async function drawPreviewZones() {
     zones.forEach(z => {
         pctx.strokeStyle = "red";
         pctx.lineWidth = 2;
-        pctx.strokeRect(z.topleft.x, z.topleft.y,
-                        z.bottomright.x - z.topleft.x,
-                        z.bottomright.y - z.topleft.y);
+        if (z.points && z.points.length === 2) {
+            // Tripwire: the line itself
+            pctx.beginPath();
+            pctx.moveTo(z.points[0][0], z.points[0][1]);
+            pctx.lineTo(z.points[1][0], z.points[1][1]);
+            pctx.stroke();
+        } else if (z.points && z.points.length > 2) {
+            // Polygon zone: outline its vertices instead of the bounding box
+            pctx.beginPath();
+            z.points.forEach(([x, y], i) => i ? pctx.lineTo(x, y) : pctx.moveTo(x, y));
+            pctx.closePath();
+            pctx.stroke();
+        } else {
+            pctx.strokeRect(z.topleft.x, z.topleft.y,
+                            z.bottomright.x - z.topleft.x,
+                            z.bottomright.y - z.topleft.y);
+        }
 
         pctx.fillStyle = "red";
         pctx.font = "14px Arial";
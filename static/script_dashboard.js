@@ -1,4 +1,5 @@
 let lineChart, barChart, heatmapChart;
+let historyRange = "live";   // "live" or a number of seconds of stored history
 
 // Init charts
 function initCharts() {
@@ -33,16 +34,43 @@ function initCharts() {
     });
 }
 
-// Update dashboard
+// Live state, kept up to date by the server-sent delta stream (or polling as a fallback)
+let liveCounts = {};
+let liveAlert = null;
+let liveFlow = { zones: {}, lines: {} };
+
 async function fetchData() {
     const res = await fetch("/get_counts");
     const data = await res.json();
-    const counts = data.counts || {};
+    liveCounts = data.counts || {};
+    liveAlert = data.alert;
+    liveFlow = data.flow || liveFlow;
+    render();
+}
+
+function connectStream() {
+    // The server sends a full snapshot first, then only the zones that changed;
+    // EventSource reconnects on its own and the next snapshot resets the state
+    const stream = new EventSource("/counts_stream");
+    stream.onmessage = (event) => {
+        const msg = JSON.parse(event.data);
+        if (msg.full) liveCounts = {};
+        Object.assign(liveCounts, msg.counts);
+        (msg.removed || []).forEach(zone => delete liveCounts[zone]);
+        if ("alert" in msg) liveAlert = msg.alert;
+        if (msg.flow) liveFlow = msg.flow;
+        render();
+    };
+}
+
+// Update dashboard
+function render() {
+    const counts = liveCounts;
 
     // 🚨 Show alert if threshold exceeded
     const alertBox = document.getElementById("alertBox");
-    if (data.alert) {
-        alertBox.innerText = data.alert;
+    if (liveAlert) {
+        alertBox.innerText = liveAlert;
         alertBox.style.display = "block";
     } else {
         alertBox.style.display = "none";
@@ -66,22 +94,17 @@ async function fetchData() {
         table.innerHTML += `<tr><td>${zone}</td><td style="text-align:right;font-weight:bold;">${count}</td></tr>`;
     }
 
-    // Line Chart
-    const now = new Date().toLocaleTimeString();
-    if (lineChart.data.labels.length > 10) {
-        lineChart.data.labels.shift();
-        lineChart.data.datasets.forEach(ds => ds.data.shift());
+    // Cumulative entries/exits per zone (with average dwell) and tripwire crossings
+    const flowTable = document.getElementById("flowTable");
+    let rows = "";
+    for (const [zone, f] of Object.entries(liveFlow.zones)) {
+        const dwell = f.dwell_avg === null ? "–" : `${f.dwell_avg}s`;
+        rows += `<tr><td>${zone}</td><td>in ${f.entered}</td><td>out ${f.exited}</td><td>avg stay ${dwell}</td></tr>`;
     }
-    lineChart.data.labels.push(now);
-    Object.entries(counts).forEach(([zone, count]) => {
-        let ds = lineChart.data.datasets.find(d => d.label === zone);
-        if (!ds) {
-            ds = { label: zone, data: [], borderColor: randomColor(), fill:false };
-            lineChart.data.datasets.push(ds);
-        }
-        ds.data.push(count);
-    });
-    lineChart.update();
+    for (const [line, f] of Object.entries(liveFlow.lines)) {
+        rows += `<tr><td>${line} ↔</td><td>in ${f.in}</td><td>out ${f.out}</td><td></td></tr>`;
+    }
+    flowTable.innerHTML = rows;
 
     // Bar Chart
     barChart.data.labels = Object.keys(counts);
@@ -102,10 +125,70 @@ async function fetchData() {
     heatmapChart.update();
 }
 
+// Line Chart: one live point every 3 seconds, however often the counts change
+function addTrendPoint() {
+    if (historyRange !== "live") return;   // history ranges are drawn by loadHistory
+    const now = new Date().toLocaleTimeString();
+    if (lineChart.data.labels.length > 10) {
+        lineChart.data.labels.shift();
+        lineChart.data.datasets.forEach(ds => ds.data.shift());
+    }
+    lineChart.data.labels.push(now);
+    Object.entries(liveCounts).forEach(([zone, count]) => {
+        let ds = lineChart.data.datasets.find(d => d.label === zone);
+        if (!ds) {
+            ds = { label: zone, data: [], borderColor: randomColor(), fill:false };
+            lineChart.data.datasets.push(ds);
+        }
+        ds.data.push(count);
+    });
+    lineChart.update();
+}
+
+// Stored history: server-side rollups, so even a week loads as a few hundred points
+async function loadHistory(range) {
+    historyRange = range;
+    lineChart.data.labels = [];
+    lineChart.data.datasets = [];
+    if (range === "live") {
+        lineChart.update();
+        return;
+    }
+    const end = Math.floor(Date.now() / 1000);
+    const res = await fetch(`/occupancy?start=${end - range}&end=${end}`);
+    const data = await res.json();
+    const stamps = [...new Set(Object.values(data.series).flat().map(p => p[0]))].sort((a, b) => a - b);
+    const index = new Map(stamps.map((ts, i) => [ts, i]));
+    lineChart.data.labels = stamps.map(ts => data.resolution >= 3600 ?
+        new Date(ts * 1000).toLocaleString() : new Date(ts * 1000).toLocaleTimeString());
+    for (const [zone, points] of Object.entries(data.series)) {
+        const values = new Array(stamps.length).fill(null);
+        points.forEach(([ts, avg]) => { values[index.get(ts)] = avg; });
+        lineChart.data.datasets.push({ label: zone, data: values, borderColor: randomColor(), fill: false, spanGaps: true });
+    }
+    lineChart.update();
+}
+
+// Spatial heatmap: a small PNG (one pixel per grid cell) scaled over the video by the browser
+function refreshSpatialHeatmap() {
+    const img = document.getElementById("spatialHeatmap");
+    const span = document.getElementById("heatmapWindow").value;
+    img.onload = () => { img.style.visibility = "visible"; };
+    img.onerror = () => { img.style.visibility = "hidden"; };
+    img.src = `/heatmap?window=${span}&t=${Date.now()}`;
+}
+
 function randomColor() {
     return "hsl(" + Math.floor(Math.random()*360) + ",70%,50%)";
 }
 
 initCharts();
-setInterval(fetchData, 3000);
-fetchData();
+if (window.EventSource) {
+    connectStream();
+} else {
+    setInterval(fetchData, 3000);
+    fetchData();
+}
+setInterval(addTrendPoint, 3000);
+refreshSpatialHeatmap();
+setInterval(refreshSpatialHeatmap, 5000);
@@ -0,0 +1,445 @@
+from collections import OrderedDict
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:   # scipy is optional; fall back to gated greedy matching
+    linear_sum_assignment = None
+
+# ----------------- TRACK RECORDS -----------------
+# One row per live track: box is (x1, y1, x2, y2), velocity in pixels/frame, age in frames
+TRACK_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("box", np.int32, 4),
+    ("velocity", np.float32, 2),
+    ("age", np.int32),
+])
+
+def make_tracks(ids, boxes, velocities, ages):
+    tracks = np.empty(len(ids), dtype=TRACK_DTYPE)
+    tracks["id"] = ids
+    tracks["box"] = np.asarray(boxes).reshape(-1, 4)
+    tracks["velocity"] = np.asarray(velocities).reshape(-1, 2)
+    tracks["age"] = ages
+    return tracks
+
+def deepsort_tracks(tracks):
+    # deep_sort_realtime Track objects -> track records for the confirmed ones
+    ids, boxes, velocities, ages = [], [], [], []
+    for tr in tracks:
+        if not tr.is_confirmed():
+            continue
+        ltrb = tr.to_ltrb()
+        if ltrb is None:
+            continue
+        ids.append(int(tr.track_id))
+        boxes.append(ltrb)
+        velocities.append(tr.mean[4:6])   # Kalman state is (x, y, a, h, vx, vy, va, vh)
+        ages.append(tr.age)
+    return make_tracks(ids, boxes, velocities, ages)
+
+def box_iou(a, b):
+    # (N, 4) x (M, 4) xyxy boxes -> (N, M) intersection over union
+    a, b = np.asarray(a, dtype=np.float32).reshape(-1, 4), np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+def xywh_to_xyxy(rects):
+    rects = np.asarray(rects, dtype=np.int32).reshape(-1, 4)
+    return np.hstack([rects[:, :2], rects[:, :2] + rects[:, 2:]])
+
+def deepsort_detections(detections, min_conf=0.0):
+    # Detector (N, 5) x1, y1, x2, y2, conf array -> deep_sort_realtime's ([left, top, width, height], conf, class)
+    # tuples; the embedding cache and the re-ID crops read the same ltwh boxes
+    kept = detections[detections[:, 4] >= min_conf]
+    xyxy = kept[:, :4].astype(int)
+    ltwh = np.hstack([xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2]])
+    return [(rect, conf, "person") for rect, conf in zip(ltwh.tolist(), kept[:, 4].tolist())]
+
+# ----------------- CENTROID TRACKER -----------------
+class CentroidTracker:
+    def __init__(self, maxDisappeared=40):
+        self.nextObjectID = 1
+        self.objects = OrderedDict()
+        self.disappeared = OrderedDict()
+        self.boxes = OrderedDict()
+        self.velocities = OrderedDict()
+        self.ages = OrderedDict()
+        self.maxDisappeared = maxDisappeared
+        self.skipped = 0
+
+    def register(self, centroid, box):
+        self.objects[self.nextObjectID] = centroid
+        self.disappeared[self.nextObjectID] = 0
+        self.boxes[self.nextObjectID] = box
+        self.velocities[self.nextObjectID] = (0.0, 0.0)
+        self.ages[self.nextObjectID] = 1
+        self.nextObjectID += 1
+
+    def deregister(self, objectID):
+        del self.objects[objectID]
+        del self.disappeared[objectID]
+        del self.boxes[objectID]
+        del self.velocities[objectID]
+        del self.ages[objectID]
+
+    def tracks(self):
+        # Tracks matched to a detection this frame, with the box they were matched to
+        ids = [objectID for objectID, missed in self.disappeared.items() if missed == 0]
+        return make_tracks(ids, [self.boxes[i] for i in ids],
+                           [self.velocities[i] for i in ids], [self.ages[i] for i in ids])
+
+    def predict(self):
+        # Frame without detections: extrapolate the last matched boxes along their velocity
+        self.skipped += 1
+        return self.hold()
+
+    def hold(self):
+        # Current positions without moving anyone: the last matched boxes plus any prediction since
+        tracks = self.tracks()
+        tracks["box"] += np.rint(np.tile(tracks["velocity"], 2) * self.skipped).astype(np.int32)
+        tracks["age"] += self.skipped
+        return tracks
+
+    def update(self, rects):
+        # Frames since the previous update; velocities are kept in pixels per frame
+        frames, self.skipped = self.skipped + 1, 0
+        if len(rects) == 0:
+            for objectID in list(self.disappeared.keys()):
+                self.disappeared[objectID] += 1
+                self.ages[objectID] += frames
+                if self.disappeared[objectID] > self.maxDisappeared:
+                    self.deregister(objectID)
+            return self.tracks()
+
+        inputBoxes = xywh_to_xyxy(rects)
+
+        inputCentroids = np.zeros((len(rects), 2), dtype="int")
+        for (i, (x, y, w, h)) in enumerate(rects):
+            cX = int(x + w / 2.0)
+            cY = int(y + h / 2.0)
+            inputCentroids[i] = (cX, cY)
+
+        if len(self.objects) == 0:
+            for i in range(0, len(inputCentroids)):
+                self.register(inputCentroids[i], inputBoxes[i])
+        else:
+            objectIDs = list(self.objects.keys())
+            objectCentroids = list(self.objects.values())
+
+            D = np.linalg.norm(np.array(objectCentroids)[:, None] - inputCentroids, axis=2)
+            rows = D.min(axis=1).argsort()
+            cols = D.argmin(axis=1)[rows]
+
+            usedRows, usedCols = set(), set()
+            for (row, col) in zip(rows, cols):
+                if row in usedRows or col in usedCols:
+                    continue
+                objectID = objectIDs[row]
+                steps = (self.disappeared[objectID] + 1) * frames
+                self.velocities[objectID] = tuple((inputCentroids[col] - self.objects[objectID]) / steps)
+                self.objects[objectID] = inputCentroids[col]
+                self.boxes[objectID] = inputBoxes[col]
+                self.disappeared[objectID] = 0
+                self.ages[objectID] += frames
+                usedRows.add(row)
+                usedCols.add(col)
+
+            unusedRows = set(range(0, D.shape[0])).difference(usedRows)
+            unusedCols = set(range(0, D.shape[1])).difference(usedCols)
+
+            for row in unusedRows:
+                objectID = objectIDs[row]
+                self.disappeared[objectID] += 1
+                self.ages[objectID] += frames
+                if self.disappeared[objectID] > self.maxDisappeared:
+                    self.deregister(objectID)
+
+            for col in unusedCols:
+                self.register(inputCentroids[col], inputBoxes[col])
+
+        return self.tracks()
+
+# ----------------- ASSIGNMENT TRACKER -----------------
+def greedy_assignment(cost):
+    # Globally cheapest pairs first; the fallback when scipy is not installed
+    order = np.argsort(cost, axis=None)
+    rows, cols = np.unravel_index(order, cost.shape)
+    used_rows = np.zeros(cost.shape[0], dtype=bool)
+    used_cols = np.zeros(cost.shape[1], dtype=bool)
+    matched_rows, matched_cols = [], []
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        if used_rows[row] or used_cols[col]:
+            continue
+        used_rows[row] = used_cols[col] = True
+        matched_rows.append(row)
+        matched_cols.append(col)
+        if len(matched_rows) == min(cost.shape):
+            break
+    return np.array(matched_rows, dtype=int), np.array(matched_cols, dtype=int)
+
+def solve_assignment(cost):
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    return greedy_assignment(cost)
+
+def solve_gated_assignment(cost, limit):
+    # Minimum-cost matching in which any row or column may stay unmatched at a cost of `limit`;
+    # pairs costing more than `limit` are never matched. A plain rectangular solve must match
+    # min(N, M) pairs, so a prohibitive gate cost still reroutes in-gate pairs around it (ID swaps).
+    # The square (N + M) matrix adds one dummy partner per row and per column to make that choice real.
+    n, m = cost.shape
+    allowed = cost <= limit
+    if linear_sum_assignment is None:
+        # Greedy never forces a match, so it only needs the gated pairs out of the way
+        rows, cols = greedy_assignment(np.where(allowed, cost, np.inf))
+        keep = allowed[rows, cols]
+        return rows[keep], cols[keep]
+    big = limit * (n + m + 1) * 2
+    padded = np.full((n + m, m + n), big, dtype=np.float64)
+    padded[:n, :m] = np.where(allowed, cost, big)
+    padded[np.arange(n), m + np.arange(n)] = limit   # row i left unmatched
+    padded[n + np.arange(m), np.arange(m)] = limit   # column j left unmatched
+    padded[n:, m:] = 0
+    rows, cols = linear_sum_assignment(padded)
+    keep = (rows < n) & (cols < m)
+    rows, cols = rows[keep], cols[keep]
+    keep = allowed[rows, cols]
+    return rows[keep], cols[keep]
+
+class AssignmentTracker:
+    # Optimal (Hungarian) matching of constant-velocity predictions to detections, gated by distance.
+    # Track state lives in flat NumPy arrays indexed by slot; free slots are reused.
+    STATE = ("ids", "alive", "centroids", "anchors", "velocities", "offsets", "disappeared", "since_seen", "age")
+
+    def __init__(self, maxDisappeared=40, maxDistance=80, capacity=64, smoothing=0.5):
+        self.maxDisappeared = maxDisappeared
+        self.maxDistance = maxDistance
+        self.smoothing = smoothing
+        self.nextObjectID = 1
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.centroids = np.zeros((capacity, 2), dtype=np.float32)    # predicted position
+        self.anchors = np.zeros((capacity, 2), dtype=np.float32)      # last measured position
+        self.velocities = np.zeros((capacity, 2), dtype=np.float32)   # pixels per frame
+        self.offsets = np.zeros((capacity, 4), dtype=np.float32)      # box corners relative to centroid
+        self.disappeared = np.zeros(capacity, dtype=np.int32)         # detection rounds without a match
+        self.since_seen = np.zeros(capacity, dtype=np.int32)          # frames since the last match
+        self.age = np.zeros(capacity, dtype=np.int32)
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        while capacity < needed:
+            capacity *= 2
+        old = [getattr(self, name) for name in self.STATE]
+        self._allocate(capacity)
+        for name, prev in zip(self.STATE, old):
+            getattr(self, name)[:len(prev)] = prev
+
+    def register(self, centroids, boxes):
+        free = np.flatnonzero(~self.alive)
+        if len(free) < len(centroids):
+            self._grow(int(self.alive.sum()) + len(centroids))
+            free = np.flatnonzero(~self.alive)
+        slots = free[:len(centroids)]
+        self.ids[slots] = np.arange(self.nextObjectID, self.nextObjectID + len(slots))
+        self.nextObjectID += len(slots)
+        self.alive[slots] = True
+        self.centroids[slots] = centroids
+        self.anchors[slots] = centroids
+        self.velocities[slots] = 0
+        self.offsets[slots] = boxes - np.tile(centroids, 2)
+        self.disappeared[slots] = 0
+        self.since_seen[slots] = 0
+        self.age[slots] = 1
+
+    def _advance(self, slots):
+        # Move tracks one frame along their velocity
+        self.centroids[slots] += self.velocities[slots]
+        self.since_seen[slots] += 1
+        self.age[slots] += 1
+
+    def _miss(self, slots):
+        # Unmatched tracks coast until they have been gone too long
+        self.disappeared[slots] += 1
+        self.alive[slots[self.disappeared[slots] > self.maxDisappeared]] = False
+
+    def predict(self):
+        # Frame without detections: every live track advances along its velocity
+        self._advance(np.flatnonzero(self.alive))
+        return self.tracks()
+
+    def hold(self):
+        return self.tracks()
+
+    def update(self, rects):
+        rects = np.asarray(rects, dtype=np.int32).reshape(-1, 4)
+        live = np.flatnonzero(self.alive)
+        inputCentroids = (rects[:, :2] + rects[:, 2:] // 2).astype(np.float32)
+        rects = xywh_to_xyxy(rects)
+        self._advance(live)
+
+        if len(rects) == 0:
+            self._miss(live)
+            return self.tracks()
+        if len(live) == 0:
+            self.register(inputCentroids, rects)
+            return self.tracks()
+
+        D = np.hypot(self.centroids[live, 0, None] - inputCentroids[None, :, 0],
+                     self.centroids[live, 1, None] - inputCentroids[None, :, 1])
+        # Tracks and detections with no partner within maxDistance stay unmatched
+        rows, cols = solve_gated_assignment(D, self.maxDistance)
+
+        slots = live[rows]
+        measured = (inputCentroids[cols] - self.anchors[slots]) / self.since_seen[slots, None]
+        self.velocities[slots] = self.smoothing * measured + (1 - self.smoothing) * self.velocities[slots]
+        self.centroids[slots] = inputCentroids[cols]
+        self.anchors[slots] = inputCentroids[cols]
+        self.offsets[slots] = rects[cols] - np.tile(inputCentroids[cols], 2)
+        self.disappeared[slots] = 0
+        self.since_seen[slots] = 0
+
+        unmatched = np.ones(len(live), dtype=bool)
+        unmatched[rows] = False
+        self._miss(live[unmatched])
+
+        new = np.ones(len(rects), dtype=bool)
+        new[cols] = False
+        if new.any():
+            self.register(inputCentroids[new], rects[new])
+        return self.tracks()
+
+    def tracks(self):
+        # Tracks matched at the last detection (moved along since, if frames were skipped), oldest ID first
+        slots = np.flatnonzero(self.alive & (self.disappeared == 0))
+        slots = slots[np.argsort(self.ids[slots])]
+        boxes = np.rint(np.tile(self.centroids[slots], 2) + self.offsets[slots])
+        return make_tracks(self.ids[slots], boxes, self.velocities[slots], self.age[slots])
+
+# ----------------- BYTETRACK-STYLE IOU TRACKER -----------------
+class ByteTracker(AssignmentTracker):
+    # ByteTrack-style association on box IoU: confident detections are matched to the predicted tracks
+    # first, then the tracks left over get a second chance with the low-confidence ones (often the same
+    # people, partly occluded). Only confident detections start new tracks. No appearance model.
+    def __init__(self, high=0.5, low=0.1, min_iou=0.2, maxDisappeared=30, capacity=64, smoothing=0.5):
+        super().__init__(maxDisappeared=maxDisappeared, capacity=capacity, smoothing=smoothing)
+        self.high = high
+        self.low = low
+        self.min_iou = min_iou
+
+    def _match(self, slots, boxes):
+        if len(slots) == 0 or len(boxes) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        predicted = np.tile(self.centroids[slots], 2) + self.offsets[slots]
+        iou = box_iou(predicted, boxes)
+        # Pairs below min_iou are never matched, and a track or box may stay unmatched instead of
+        # pushing others onto worse pairs; leftovers go to the low-score pass or become new tracks
+        return solve_gated_assignment(1.0 - iou, 1.0 - self.min_iou)
+
+    def _measure(self, slots, boxes):
+        centroids = (boxes[:, :2] + boxes[:, 2:]) / 2
+        measured = (centroids - self.anchors[slots]) / self.since_seen[slots, None]
+        self.velocities[slots] = self.smoothing * measured + (1 - self.smoothing) * self.velocities[slots]
+        self.centroids[slots] = centroids
+        self.anchors[slots] = centroids
+        self.offsets[slots] = boxes - np.tile(centroids, 2)
+        self.disappeared[slots] = 0
+        self.since_seen[slots] = 0
+
+    def update(self, detections):
+        # detections: (N, 5) x1, y1, x2, y2, confidence
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 5)
+        live = np.flatnonzero(self.alive)
+        self._advance(live)
+        strong = detections[detections[:, 4] >= self.high, :4]
+        weak = detections[(detections[:, 4] >= self.low) & (detections[:, 4] < self.high), :4]
+
+        rows, cols = self._match(live, strong)
+        self._measure(live[rows], strong[cols])
+        rest = np.setdiff1d(np.arange(len(live)), rows)
+        weak_rows, weak_cols = self._match(live[rest], weak)
+        self._measure(live[rest[weak_rows]], weak[weak_cols])
+        self._miss(live[np.setdiff1d(rest, rest[weak_rows])])
+
+        new = np.ones(len(strong), dtype=bool)
+        new[cols] = False
+        if new.any():
+            self.register((strong[new, :2] + strong[new, 2:]) / 2, strong[new])
+        return self.tracks()
+
+# ----------------- DEEPSORT ADAPTER -----------------
+class DeepSortTracker:
+    # deep_sort_realtime.DeepSort behind the same update/predict interface as the trackers above.
+    # Appearance embeddings are cached per track: a detection that still overlaps the box its track
+    # was last embedded at reuses that embedding, so only new or moved people go through the
+    # re-ID model, all in one batch. Each cached embedding is refreshed after `refresh` frames.
+    # update() takes deep_sort_realtime's ltwh detections; deepsort_detections builds them from the detector.
+    def __init__(self, deepsort, reuse_iou=0.7, refresh=10, cache_size=256):
+        self.deepsort = deepsort
+        self.reuse_iou = reuse_iou
+        self.refresh = refresh
+        self.cache_size = cache_size
+        self.cache = OrderedDict()   # track_id -> (embedding, ltrb box, frame)
+        self.frame = 0
+        self.embedded = 0
+        self.reused = 0
+
+    def _embeddings(self, detections, frame):
+        boxes = xywh_to_xyxy([d[0] for d in detections]) if detections else np.zeros((0, 4), np.int32)
+        embeds = [None] * len(detections)
+        if self.cache and detections:
+            ids = list(self.cache)
+            iou = box_iou(boxes, [self.cache[i][1] for i in ids])
+            iou[:, [self.frame - self.cache[i][2] >= self.refresh for i in ids]] = 0
+            # Reuse only on a mutual best match, so two people close together never swap embeddings
+            best = iou.argmax(axis=1)
+            rows = np.arange(len(detections))
+            mutual = iou.argmax(axis=0)[best] == rows
+            for d in np.flatnonzero((iou[rows, best] >= self.reuse_iou) & mutual):
+                embeds[d] = self.cache[ids[best[d]]][0]
+        missing = [i for i, e in enumerate(embeds) if e is None]
+        if missing:
+            for i, embedding in zip(missing, self.deepsort.generate_embeds(frame, [detections[i] for i in missing])):
+                embeds[i] = embedding
+        self.embedded += len(missing)
+        self.reused += len(detections) - len(missing)
+        return boxes, embeds, set(missing)
+
+    def update(self, detections, frame=None):
+        if frame is None or self.deepsort.embedder is None:
+            return deepsort_tracks(self.deepsort.update_tracks(detections, frame=frame))
+        self.frame += 1
+        boxes, embeds, fresh = self._embeddings(detections, frame)
+        tracks = self.deepsort.update_tracks(detections, embeds=embeds, frame=frame,
+                                             others=list(range(len(detections))))
+        live = set()
+        for tr in tracks:
+            live.add(tr.track_id)
+            d = tr.get_det_supplementary()
+            if tr.time_since_update == 0 and d in fresh:
+                self.cache[tr.track_id] = (embeds[d], boxes[d], self.frame)
+                self.cache.move_to_end(tr.track_id)
+        for track_id in [i for i in self.cache if i not in live]:
+            del self.cache[track_id]
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return deepsort_tracks(tracks)
+
+    def predict(self):
+        # Kalman prediction only: no appearance embedding and no matching
+        self.deepsort.tracker.predict()
+        return deepsort_tracks(self.deepsort.tracker.tracks)
+
+    def hold(self):
+        return deepsort_tracks(self.deepsort.tracker.tracks)
+
+    def status(self):
+        return {"embedded": self.embedded, "reused": self.reused, "cached": len(self.cache)}
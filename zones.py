@@ -0,0 +1,205 @@
+import json, threading
+import cv2
+import numpy as np
+
+# ----------------- ZONE CACHE -----------------
+class ZoneCache:
+    # Zones live in memory; CRUD routes refresh the cache after writing, frame loops only read it
+    def __init__(self, load):
+        self.load = load
+        self.lock = threading.Lock()
+        self.zones = None
+        self.version = 0
+        self.by_source = {}
+        self.indexes = {}
+
+    def reload(self):
+        # Derived state (zone indexes, motion masks, ROI windows) is keyed on the zones tuple it was
+        # built from, so replacing the tuple is all the invalidation it needs
+        zones = tuple(self.load())
+        with self.lock:
+            self.zones = zones
+            self.version += 1
+            self.by_source = {}
+            self.indexes = {}
+
+    def ensure_loaded(self):
+        if self.zones is None:
+            self.reload()
+
+    def snapshot(self):
+        with self.lock:
+            return self.version, self.zones or ()
+
+    def for_source(self, name):
+        # Zones without a source_name apply to every source
+        with self.lock:
+            zones = self.by_source.get(name)
+            if zones is None:
+                zones = tuple(z for z in self.zones or () if z.get('source_name') in (None, name))
+                self.by_source[name] = zones
+            return zones
+
+    def index_for(self, name):
+        zones = self.for_source(name)
+        with self.lock:
+            index = self.indexes.get(name)
+            if index is None or index.zones is not zones:
+                index = self.indexes[name] = ZoneIndex(zones)
+            return index
+
+# ----------------- VECTORIZED OCCUPANCY -----------------
+def expand_ranges(lengths):
+    # For ranges of the given lengths return (owner, offset) for every element, without a Python loop
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner, np.arange(owner.size) - starts
+
+def zone_rects(zones):
+    rects = np.array([[z['top_left_x'], z['top_left_y'], z['bottom_right_x'], z['bottom_right_y']]
+                      for z in zones], dtype=np.float32).reshape(-1, 4)
+    # Zones can be drawn from any corner; normalise to (min, min, max, max)
+    return np.hstack([np.minimum(rects[:, :2], rects[:, 2:]), np.maximum(rects[:, :2], rects[:, 2:])])
+
+def overlaps(boxes, rects):
+    # Strict overlap between every (x1, y1, x2, y2) box and rect; boxes (N, 4), rects (Z, 4) -> (N, Z)
+    # max(a1, b1) < min(a2, b2) on both axes, split into four plain comparisons
+    valid_boxes = (boxes[:, 0] < boxes[:, 2]) & (boxes[:, 1] < boxes[:, 3])
+    valid_rects = (rects[:, 0] < rects[:, 2]) & (rects[:, 1] < rects[:, 3])
+    member = np.less.outer(boxes[:, 0], rects[:, 2])
+    member &= np.greater.outer(boxes[:, 2], rects[:, 0])
+    member &= np.less.outer(boxes[:, 1], rects[:, 3])
+    member &= np.greater.outer(boxes[:, 3], rects[:, 1])
+    member &= valid_boxes[:, None] & valid_rects[None, :]
+    return member
+
+class ZoneGrid:
+    # Uniform grid over the zone extent: each cell lists the zones touching it (CSR layout)
+    def __init__(self, rects, cell_size=None):
+        self.origin = rects[:, :2].min(axis=0)
+        extent = rects[:, 2:].max(axis=0) - self.origin
+        if cell_size is None:
+            cell_size = max(16.0, float(np.median(rects[:, 2:] - rects[:, :2])))
+        self.cell_size = cell_size
+        self.shape = np.maximum(np.ceil(extent / cell_size).astype(int), 1)
+
+        zone_ids, cells = self._cells(rects)
+        order = np.argsort(cells, kind="stable")
+        self.cell_zones = zone_ids[order]
+        self.cell_ptr = np.zeros(self.shape[0] * self.shape[1] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.shape[0] * self.shape[1]), out=self.cell_ptr[1:])
+
+    def _cells(self, rects):
+        lo = np.floor((rects[:, :2] - self.origin) / self.cell_size).astype(int)
+        hi = np.floor((rects[:, 2:] - self.origin) / self.cell_size).astype(int)
+        lo = np.clip(lo, 0, self.shape - 1)
+        hi = np.clip(hi, 0, self.shape - 1)
+        inside = (rects[:, 2:] > self.origin).all(axis=1) & \
+                 (rects[:, :2] < self.origin + self.shape * self.cell_size).all(axis=1)
+        spans = np.where(inside[:, None], hi - lo + 1, 0)
+        owner, k = expand_ranges(spans[:, 0] * spans[:, 1])
+        cx = lo[owner, 0] + k % spans[owner, 0]
+        cy = lo[owner, 1] + k // spans[owner, 0]
+        return owner, cy * self.shape[0] + cx
+
+    def candidates(self, boxes):
+        # (box, zone) pairs that share at least one grid cell; a pair may repeat once per shared cell
+        box_ids, cells = self._cells(boxes)
+        lengths = self.cell_ptr[cells + 1] - self.cell_ptr[cells]
+        pair, k = expand_ranges(lengths)
+        return box_ids[pair], self.cell_zones[self.cell_ptr[cells[pair]] + k]
+
+# ----------------- POLYGON ZONES -----------------
+def zone_geometry(data):
+    # Rectangle corners from a zone request plus the polygon JSON when "points" are given;
+    # polygon zones keep their bounding box in the rectangle columns
+    points = data.get('points')
+    if points:
+        xs, ys = [int(p['x']) for p in points], [int(p['y']) for p in points]
+        polygon = json.dumps([[x, y] for x, y in zip(xs, ys)])
+        return (min(xs), min(ys), max(xs), max(ys)), polygon
+    return (data['topleft']['x'], data['topleft']['y'],
+            data['bottomright']['x'], data['bottomright']['y']), None
+
+def zone_points(zone):
+    polygon = zone.get('polygon')
+    return json.loads(polygon) if polygon else None
+
+def is_line(zone):
+    # A zone drawn with exactly two points is a tripwire: it counts crossings, not occupancy
+    points = zone_points(zone)
+    return points is not None and len(points) == 2
+
+class ZoneMasks:
+    # Polygons rasterised once per frame size into a packed bitmask: one bit per zone per pixel
+    def __init__(self, polygons, shape):
+        height, width = shape[:2]
+        self.shape = (height, width)
+        self.count = len(polygons)
+        self.bits = np.zeros((height, width, (self.count + 7) // 8), dtype=np.uint8)
+        layer = np.zeros((height, width), dtype=np.uint8)
+        for i, points in enumerate(polygons):
+            layer[:] = 0
+            cv2.fillPoly(layer, [np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)], 1)
+            # np.unpackbits is big-endian within a byte, so zone i lives in bit 7 - i % 8
+            self.bits[:, :, i // 8] |= layer << (7 - i % 8)
+
+    def lookup(self, points):
+        # points: (N, 2) x, y -> (N, count) membership, one mask read per point
+        xy = np.asarray(points).reshape(-1, 2).astype(int)
+        inside = (xy[:, 0] >= 0) & (xy[:, 0] < self.shape[1]) & (xy[:, 1] >= 0) & (xy[:, 1] < self.shape[0])
+        packed = np.zeros((len(xy), self.bits.shape[2]), dtype=np.uint8)
+        packed[inside] = self.bits[xy[inside, 1], xy[inside, 0]]
+        return np.unpackbits(packed, axis=1, count=self.count).astype(bool)
+
+class ZoneIndex:
+    def __init__(self, zones, grid_threshold=128):
+        self.zones = zones
+        lines = [z for z in zones if is_line(z)]
+        self.line_names = [z['zone_name'] for z in lines]
+        self.lines = np.array([sum(zone_points(z), []) for z in lines], dtype=np.float32).reshape(-1, 4)
+        zones = [z for z in zones if not is_line(z)]
+        self.names = [z['zone_name'] for z in zones]
+        polygons = [zone_points(z) for z in zones]
+        self.rect_ids = np.array([i for i, p in enumerate(polygons) if not p], dtype=int)
+        self.polygon_ids = np.array([i for i, p in enumerate(polygons) if p], dtype=int)
+        self.polygons = [p for p in polygons if p]
+        self.rects = zone_rects([zones[i] for i in self.rect_ids])
+        # Dense N x Z tests are cheapest for a handful of zones; large sites go through the grid
+        self.grid = ZoneGrid(self.rects) if len(self.rects) >= grid_threshold else None
+        self.masks = None
+
+    def masks_for(self, shape):
+        # Rebuilt only when the zones (a new index) or the frame size change
+        if self.masks is None or self.masks.shape != tuple(shape[:2]):
+            self.masks = ZoneMasks(self.polygons, shape)
+        return self.masks
+
+    def assign(self, boxes, frame_shape=None, foot_boxes=None):
+        # boxes: (N, 4) x1, y1, x2, y2 -> per-zone counts (Z,) and membership (N, Z)
+        # Rectangle zones count box overlap; polygon zones test each box's foot point against their mask.
+        # foot_boxes, when the drawn boxes were trimmed, are the full boxes whose bottom edge is the feet.
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        foot_boxes = boxes if foot_boxes is None else np.asarray(foot_boxes, dtype=np.float32).reshape(-1, 4)
+        membership = np.zeros((len(boxes), len(self.names)), dtype=bool)
+        if len(self.rect_ids) and len(boxes):
+            if self.grid is None:
+                membership[:, self.rect_ids] = overlaps(boxes, self.rects)
+            else:
+                box_ids, zone_ids = self.grid.candidates(boxes)
+                b, r = boxes[box_ids], self.rects[zone_ids]
+                hit = (np.maximum(b[:, :2], r[:, :2]) < np.minimum(b[:, 2:], r[:, 2:])).all(axis=1)
+                membership[box_ids[hit], self.rect_ids[zone_ids[hit]]] = True
+        if len(self.polygon_ids) and len(boxes) and frame_shape is not None:
+            feet = np.stack([(foot_boxes[:, 0] + foot_boxes[:, 2]) / 2, foot_boxes[:, 3] - 1], axis=1)
+            membership[:, self.polygon_ids] = self.masks_for(frame_shape).lookup(feet)
+        return membership.sum(axis=0), membership
+
+    def counts(self, counts):
+        zone_counts = {name: 0 for name in self.names}
+        for name, count in zip(self.names, counts.tolist()):
+            zone_counts[name] += count
+        return zone_counts
+
+    def count(self, boxes, frame_shape=None):
+        return self.counts(self.assign(boxes, frame_shape)[0])